@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from cli import COMMANDS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "startup_baseline.json")
+
+# Imports deferred past cli.load_command() that a subcommand always pays for
+# before doing any work, so they belong in its cold-start cost.
+DEFERRED_IMPORTS = {
+    "summarize": ["bs4", "google.generativeai"],
+    "full-summary": ["google.generativeai"],
+    "extract-images": ["bs4"],
+    "serve": ["google.generativeai"],
+    "export-bundle": [],
+}
+
+def parse_importtime(stderr):
+    """Parses `python -X importtime` output into a {module: (self_us, cumulative_us)} map."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def measure_command(command):
+    """Starts a fresh interpreter that loads one subcommand and reports its cold-start cost."""
+    code = f"import cli; cli.load_command({command!r})"
+    for module in DEFERRED_IMPORTS.get(command, []):
+        code += f"; import {module}"
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    wall_time = time.perf_counter() - start
+    modules = parse_importtime(result.stderr)
+    return {
+        "wall_time": wall_time,
+        "import_time": sum(self_us for self_us, _ in modules.values()) / 1e6,
+        "modules": modules,
+    }
+
+def benchmark(runs=5):
+    """Returns the median wall time, import time and module count of every subcommand."""
+    results = {}
+    for command in COMMANDS:
+        samples = [measure_command(command) for _ in range(runs)]
+        results[command] = {
+            "wall_time": statistics.median(s["wall_time"] for s in samples),
+            "import_time": statistics.median(s["import_time"] for s in samples),
+            "modules": len(samples[-1]["modules"]),
+        }
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """Returns the subcommands whose wall time grew by more than tolerance over the baseline."""
+    regressions = []
+    for command, result in results.items():
+        previous = baseline.get(command)
+        if previous and result["wall_time"] > previous["wall_time"] * (1 + tolerance):
+            regressions.append(command)
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"{'command':<16}{'wall p50 (s)':>14}{'import p50 (s)':>16}{'modules':>10}{'vs baseline':>14}")
+    for command, result in results.items():
+        change = ""
+        if baseline and command in baseline and baseline[command]["wall_time"]:
+            change = f"{result['wall_time'] / baseline[command]['wall_time'] - 1:+.0%}"
+        print(f"{command:<16}{result['wall_time']:>14.3f}{result['import_time']:>16.3f}"
+              f"{result['modules']:>10}{change:>14}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold-start time of each cli.py subcommand.")
+    parser.add_argument("runs", type=int, nargs="?", default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON file holding earlier results.")
+    parser.add_argument("--save", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed wall-time growth over the baseline before failing (default 0.2 = 20%%).")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.runs)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Cold start regressed by more than {args.tolerance:.0%} for: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
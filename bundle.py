@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+from utils import get_chapter_identifier, format_chapter_summary, format_final_summary
+
+BUNDLE_EXTENSION = ".sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    identifier TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    item_name TEXT NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    filename TEXT PRIMARY KEY,
+    chapter_identifier TEXT NOT NULL,
+    context_text TEXT NOT NULL DEFAULT '',
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_by_chapter ON images (chapter_identifier);
+"""
+
+
+def get_bundle_path(epub_path, book_folder_name):
+    """Returns the bundle path for a book, next to its EPUB like the output folder."""
+    return os.path.join(os.path.dirname(epub_path), book_folder_name + BUNDLE_EXTENSION)
+
+
+def check_export_filename(filename):
+    """Returns filename if it names a file directly inside the export folder; raises ValueError otherwise."""
+    separators = {"/", "\\", os.sep} | ({os.altsep} if os.altsep else set())
+    if not filename or filename in (".", "..") or any(sep in filename for sep in separators):
+        raise ValueError(f"Refusing to export {filename!r}: not a plain file name")
+    return filename
+
+
+def write_book_metadata(bundle, book, book_folder_name, epub_path):
+    """Records the book's title, output folder name and source EPUB in a bundle."""
+    book_title_metadata = book.get_metadata('DC', 'title')
+    bundle.set_metadata("title", book_title_metadata[0][0] if book_title_metadata else book_folder_name)
+    bundle.set_metadata("book_folder_name", book_folder_name)
+    bundle.set_metadata("source_epub", os.path.abspath(epub_path))
+
+
+class BookBundle:
+    """
+    A single SQLite file holding a book's chapter summaries, images, metadata and full summary.
+
+    Chapters and images are keyed by chapter identifier, so a single chapter
+    can be read without loading the rest of the book. Every write is
+    committed immediately, and the bundle may be shared between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._connection:
+            return self._connection.execute(sql, params).fetchall()
+
+    def set_metadata(self, key, value):
+        self._execute(
+            "INSERT INTO metadata (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def get_metadata(self):
+        return dict(self._execute("SELECT key, value FROM metadata"))
+
+    def add_chapter(self, item_name, summary, position=None):
+        """
+        Stores (or replaces) a chapter summary and returns its chapter identifier.
+
+        position is the chapter's place in the book's reading order; a new
+        chapter added without one is placed after those already stored, and a
+        rewritten one keeps its place.
+        """
+        identifier = get_chapter_identifier(item_name)
+        self._execute(
+            "INSERT INTO chapters (identifier, position, item_name, summary) "
+            "VALUES (?, COALESCE(?, (SELECT COALESCE(MAX(position) + 1, 0) FROM chapters)), ?, ?) "
+            "ON CONFLICT(identifier) DO UPDATE SET position = COALESCE(?, position), "
+            "item_name = excluded.item_name, summary = excluded.summary",
+            (identifier, position, item_name, summary, position),
+        )
+        return identifier
+
+    def add_image(self, filename, data, chapter_identifier, context_text=""):
+        self._execute(
+            "INSERT INTO images (filename, chapter_identifier, context_text, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(filename) DO UPDATE SET chapter_identifier = excluded.chapter_identifier, "
+            "context_text = excluded.context_text, data = excluded.data",
+            (filename, chapter_identifier, context_text, sqlite3.Binary(data)),
+        )
+
+    def set_full_summary(self, full_summary):
+        self.set_metadata("full_summary", full_summary)
+
+    def get_full_summary(self):
+        return self.get_metadata().get("full_summary")
+
+    def chapter_identifiers(self):
+        """Returns the identifiers of all stored chapters in reading order."""
+        return [row[0] for row in self._execute("SELECT identifier FROM chapters ORDER BY position")]
+
+    def get_chapter(self, identifier):
+        """Returns a chapter's item name, summary and image filenames, or None if it is not stored."""
+        rows = self._execute("SELECT item_name, summary FROM chapters WHERE identifier = ?", (identifier,))
+        if not rows:
+            return None
+        images = self._execute(
+            "SELECT filename FROM images WHERE chapter_identifier = ? ORDER BY filename", (identifier,)
+        )
+        item_name, summary = rows[0]
+        return {
+            "identifier": identifier,
+            "item_name": item_name,
+            "summary": summary,
+            "images": [row[0] for row in images],
+        }
+
+    def get_chapter_markdown(self, identifier):
+        """Returns a chapter exactly as it would be written to its own Markdown file."""
+        chapter = self.get_chapter(identifier)
+        return format_chapter_summary(chapter["summary"], chapter["item_name"]) if chapter else None
+
+    def get_image(self, filename):
+        rows = self._execute("SELECT data FROM images WHERE filename = ?", (filename,))
+        return bytes(rows[0][0]) if rows else None
+
+    def export_to_folder(self, output_dir):
+        """
+        Writes the bundle out in the one-file-per-chapter folder layout and returns output_dir.
+
+        Every file name read from the bundle is checked first, so a bundle
+        cannot write outside output_dir; ValueError is raised otherwise.
+        """
+        identifiers = self.chapter_identifiers()
+        images = self._execute("SELECT filename, data FROM images")
+        metadata = self.get_metadata()
+        full_summary = metadata.get("full_summary")
+        book_folder_name = metadata.get("book_folder_name") or os.path.splitext(os.path.basename(self.path))[0]
+        for identifier in identifiers:
+            check_export_filename(f"{identifier}.md")
+        for filename, _ in images:
+            check_export_filename(filename)
+        if full_summary:
+            check_export_filename(f"summary_{book_folder_name}_Full.md")
+
+        os.makedirs(output_dir, exist_ok=True)
+        for identifier in identifiers:
+            with open(os.path.join(output_dir, f"{identifier}.md"), "w", encoding="utf-8") as f:
+                f.write(self.get_chapter_markdown(identifier))
+
+        for filename, data in images:
+            with open(os.path.join(output_dir, filename), "wb") as f:
+                f.write(data)
+
+        if full_summary:
+            with open(os.path.join(output_dir, f"summary_{book_folder_name}_Full.md"), "w", encoding="utf-8") as f:
+                f.write(format_final_summary(full_summary, book_folder_name))
+        return output_dir
+
+
+def export_bundle(bundle_path, output_dir=None):
+    """Exports a bundle to a folder, by default one named after the bundle next to it."""
+    if not os.path.exists(bundle_path):
+        print(f"Error: bundle not found at {bundle_path}")
+        return None
+    if output_dir is None:
+        output_dir = os.path.splitext(bundle_path)[0]
+    with BookBundle(bundle_path) as bundle:
+        try:
+            bundle.export_to_folder(output_dir)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return None
+    print(f"Bundle exported to {output_dir}")
+    return output_dir
@@ -0,0 +1,133 @@
+import argparse
+import os
+import sys
+
+# Heavy dependencies (ebooklib, google.generativeai, BeautifulSoup, numpy) are
+# only imported once a subcommand has been chosen, and only those it needs.
+
+def _load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+def _load_summarize():
+    _load_env()
+    from main import main
+    return lambda args: main(args.epub_path, False, args.compress_ratio, args.token_budget, args.model_routing,
+                             args.deadline, args.hedge, args.bundle, args.hedge_after)
+
+def _load_full_summary():
+    _load_env()
+    from main import main
+    return lambda args: main(args.epub_path, full_summary_only=True, model_routing=args.model_routing,
+                             deadline=args.deadline, hedge=args.hedge, bundle=args.bundle,
+                             hedge_after=args.hedge_after)
+
+def _load_extract_images():
+    from extract_images import extract_images
+    return lambda args: extract_images(args.epub_path)
+
+def _load_export_bundle():
+    from bundle import export_bundle
+    return lambda args: export_bundle(args.bundle_path, args.output_dir)
+
+def _load_serve():
+    _load_env()
+    from service import serve
+    return lambda args: serve(args.inbox, args.host, None if args.no_http else args.port, args.workers,
+                              args.compress_ratio, args.token_budget, args.model_routing, args.deadline, args.hedge,
+                              args.bundle, args.hedge_after)
+
+COMMANDS = {
+    "summarize": _load_summarize,
+    "full-summary": _load_full_summary,
+    "extract-images": _load_extract_images,
+    "serve": _load_serve,
+    "export-bundle": _load_export_bundle,
+}
+
+def load_command(name):
+    """Imports the dependencies of a subcommand and returns its runner."""
+    return COMMANDS[name]()
+
+def normalize_path(path):
+    """Normalizes a path given on the command line (e.g. with shell-escaped spaces)."""
+    return os.path.normpath(path.replace('\\', ''))
+
+def compress_ratio(value):
+    """Parses a --compress-ratio value, which must be in the range (0, 1]."""
+    ratio = float(value)
+    if not 0 < ratio <= 1:
+        raise argparse.ArgumentTypeError(f"must be in the range (0, 1], got {value}")
+    return ratio
+
+def token_budget(value):
+    """Parses a --token-budget value, which must be a positive integer."""
+    budget = int(value)
+    if budget <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return budget
+
+def add_api_arguments(parser):
+    parser.add_argument("--model-routing", action="store_true",
+                        help="Pick the Gemini model by input size and stage, failing over on sustained 429s or timeouts.")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Abandon and retry any API call that takes longer than this many seconds.")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Issue a duplicate API call once a call runs past the observed p95 latency "
+                             "(after 20 calls have been observed).")
+    parser.add_argument("--hedge-after", type=float, default=None,
+                        help="Issue a duplicate API call once a call runs past this many seconds (implies --hedge).")
+
+def add_output_arguments(parser):
+    parser.add_argument("--bundle", action="store_true",
+                        help="Write each book to a single indexed SQLite bundle instead of a folder of files.")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Summarize EPUB books and extract their images.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summarize = subparsers.add_parser("summarize", help="Summarize each chapter and generate a full book summary.")
+    summarize.add_argument("epub_path", type=normalize_path)
+    summarize.add_argument("--compress-ratio", type=compress_ratio, default=None,
+                           help="Locally compress each chapter to this fraction of its tokens first.")
+    summarize.add_argument("--token-budget", type=token_budget, default=None,
+                           help="Locally compress each chapter to at most this many tokens first.")
+    add_api_arguments(summarize)
+    add_output_arguments(summarize)
+
+    full_summary = subparsers.add_parser("full-summary", help="Generate the full summary from existing chapter summaries.")
+    full_summary.add_argument("epub_path", type=normalize_path)
+    add_api_arguments(full_summary)
+    add_output_arguments(full_summary)
+
+    extract = subparsers.add_parser("extract-images", help="Extract the images of each chapter.")
+    extract.add_argument("epub_path", type=normalize_path)
+
+    serve = subparsers.add_parser("serve", help="Run as a long-lived service that summarizes queued books.")
+    serve.add_argument("--inbox", default=None, help="Folder to watch for new EPUB files.")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--no-http", action="store_true", help="Disable the HTTP API (requires --inbox).")
+    serve.add_argument("--workers", type=int, default=4, help="Number of chapters summarized concurrently.")
+    serve.add_argument("--compress-ratio", type=compress_ratio, default=None)
+    serve.add_argument("--token-budget", type=token_budget, default=None)
+    add_api_arguments(serve)
+    add_output_arguments(serve)
+
+    export = subparsers.add_parser("export-bundle", help="Export a bundle back to the folder layout.")
+    export.add_argument("bundle_path", type=normalize_path)
+    export.add_argument("--output-dir", type=normalize_path, default=None,
+                        help="Defaults to a folder named after the bundle, next to it.")
+
+    return parser
+
+def run(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "serve" and args.no_http and not args.inbox:
+        parser.error("serve needs an --inbox when --no-http is given")
+    runner = load_command(args.command)
+    runner(args)
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
@@ -0,0 +1,147 @@
+import re
+import time
+import numpy as np
+from utils import estimate_tokens
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])')
+_WORD = re.compile(r"[a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have he her his i if in into is it its
+me my not of on or our she so than that the their them then there these they this to
+was we were what when which who will with would you your
+""".split())
+
+
+def html_to_text(content: str) -> str:
+    """Strips the markup from chapter HTML, keeping one paragraph per line of its <body>."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    root = soup.body or soup
+    lines = [line.strip() for line in root.get_text(separator="\n").splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def split_sentences(text: str) -> list:
+    """Splits plain text into sentences on terminal punctuation and line breaks."""
+    sentences = []
+    for paragraph in text.splitlines():
+        for sentence in _SENTENCE_SPLIT.split(paragraph.strip()):
+            if sentence.strip():
+                sentences.append(sentence.strip())
+    return sentences
+
+
+def tfidf_matrix(sentences: list) -> np.ndarray:
+    """Builds an L2-normalised TF-IDF matrix with one row per sentence."""
+    tokenized = [[w for w in _WORD.findall(s.lower()) if w not in STOPWORDS] for s in sentences]
+    vocabulary = {}
+    for words in tokenized:
+        for word in words:
+            vocabulary.setdefault(word, len(vocabulary))
+
+    counts = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float64)
+    for row, words in enumerate(tokenized):
+        if words:
+            np.add.at(counts[row], [vocabulary[w] for w in words], 1.0)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1.0
+    weights = counts * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return np.divide(weights, norms, out=np.zeros_like(weights), where=norms > 0)
+
+
+def textrank_scores(sentences: list, damping: float = 0.85, max_iter: int = 100, tol: float = 1e-6) -> np.ndarray:
+    """Scores sentences with TextRank over their TF-IDF cosine similarity graph."""
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0)
+
+    matrix = tfidf_matrix(sentences)
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # Sentences with no shared vocabulary link uniformly to every other sentence
+    transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1.0 / n), where=row_sums > 0)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def select_within_budget(order: np.ndarray, lengths: np.ndarray, limit: int) -> np.ndarray:
+    """
+    Greedily picks sentences in ranked order, skipping any that would overrun the limit.
+
+    Returns the selected sentence indices in document order; the best-ranked
+    sentence is always kept so the result is never empty.
+    """
+    selected = []
+    remaining = order[lengths[order] <= limit]
+    budget = limit
+    while remaining.size:
+        # The ranked prefix that fits is taken at once, the sentence after it is skipped
+        fits = np.cumsum(lengths[remaining]) <= budget
+        prefix = remaining.size if fits.all() else int(np.argmin(fits))
+        selected.append(remaining[:prefix])
+        budget -= int(lengths[remaining[:prefix]].sum())
+        remaining = remaining[prefix + 1:]
+        remaining = remaining[lengths[remaining] <= budget]
+
+    selected = np.concatenate(selected) if selected else order[:1]
+    return np.sort(selected)
+
+
+def validate_limits(ratio: float = None, token_budget: int = None):
+    """Raises ValueError unless at least one valid compression limit is given."""
+    if ratio is None and token_budget is None:
+        raise ValueError("Either ratio or token_budget must be provided.")
+    if ratio is not None and not 0 < ratio <= 1:
+        raise ValueError("ratio must be in the range (0, 1].")
+    if token_budget is not None and token_budget <= 0:
+        raise ValueError("token_budget must be a positive integer.")
+
+
+def compress_text(text: str, ratio: float = None, token_budget: int = None):
+    """
+    Reduces text to its highest-ranked sentences, kept in their original order.
+
+    Either a target ratio (fraction of the original tokens to keep) or a token
+    budget must be given; when both are set the tighter limit wins. Returns the
+    compressed text and a dict of statistics including the achieved compression
+    ratio and the local CPU time spent.
+    """
+    validate_limits(ratio, token_budget)
+
+    start = time.process_time()
+    original_tokens = estimate_tokens(text)
+    limit = original_tokens
+    if ratio is not None:
+        limit = min(limit, int(original_tokens * ratio))
+    if token_budget is not None:
+        limit = min(limit, token_budget)
+
+    sentences = split_sentences(text)
+    if original_tokens <= limit or len(sentences) <= 1:
+        compressed = text
+    else:
+        scores = textrank_scores(sentences)
+        lengths = np.array([estimate_tokens(s) for s in sentences])
+        order = np.argsort(-scores, kind="stable")
+        selected = select_within_budget(order, lengths, limit)
+        compressed = "\n".join(sentences[i] for i in selected)
+
+    compressed_tokens = estimate_tokens(compressed)
+    stats = {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "compression_ratio": compressed_tokens / original_tokens if original_tokens else 1.0,
+        "cpu_time": time.process_time() - start,
+    }
+    return compressed, stats
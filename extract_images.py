@@ -4,7 +4,6 @@ from ebooklib import epub
 import os
 import re
 import sys
-from bs4 import BeautifulSoup
 from utils import sanitize_filename, get_book_output_folder, get_chapter_identifier
 
 def create_image_map(book):
@@ -23,8 +22,14 @@ def create_image_map(book):
             image_map[item.get_name()] = item.get_content()
     return image_map
 
-def extract_chapter_images_and_context(chapter_item, image_map, output_dir, chapter_image_counts):
-    """Extracts images from a chapter, saves them, and returns their context."""
+def extract_chapter_images_and_context(chapter_item, image_map, output_dir, chapter_image_counts, bundle=None):
+    """
+    Extracts images from a chapter, saves them, and returns their context.
+
+    If a BookBundle is given the images are stored in it instead of output_dir;
+    the returned image paths are the same either way.
+    """
+    from bs4 import BeautifulSoup
     image_context = []
     chapter_identifier = get_chapter_identifier(chapter_item.get_name())
     soup = BeautifulSoup(chapter_item.get_content(), 'html.parser')
@@ -42,8 +47,11 @@ def extract_chapter_images_and_context(chapter_item, image_map, output_dir, chap
                 image_path = os.path.join(output_dir, image_filename)
 
                 try:
-                    with open(image_path, 'wb') as img_file:
-                        img_file.write(image_map[cleaned_src])
+                    if bundle:
+                        bundle.add_image(image_filename, image_map[cleaned_src], chapter_identifier, img_tag.get('alt', ''))
+                    else:
+                        with open(image_path, 'wb') as img_file:
+                            img_file.write(image_map[cleaned_src])
                     print(f"Extracted image: {image_filename} from {chapter_item.get_name()}")
                     image_context.append({
                         "image_path": image_path,
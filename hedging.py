@@ -0,0 +1,187 @@
+import collections
+import math
+import threading
+import time
+from concurrent.futures import CancelledError, Future, FIRST_COMPLETED, wait
+
+
+def percentile(samples, q):
+    """Returns the nearest-rank q-th percentile (0-100) of samples, or 0.0 if there are none."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class LatencyWindow:
+    """Keeps the most recent latencies (in seconds) for percentile queries."""
+
+    def __init__(self, size=1000):
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, q):
+        with self._lock:
+            return percentile(list(self._samples), q)
+
+    def report(self):
+        with self._lock:
+            samples = list(self._samples)
+        return {
+            "count": len(samples),
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+        }
+
+
+class HedgedCaller:
+    """
+    Wraps a call_model(model_name, prompt) function with a deadline, cancellation and hedging.
+
+    A call that is still running after deadline seconds is abandoned and
+    raises TimeoutError. With hedge enabled, a duplicate request is issued
+    once a call has run longer than the observed p95 of single attempts (or
+    hedge_after seconds, if given), and the first successful response wins.
+    Without hedge_after, hedging only starts once min_samples attempts have
+    been observed, so a run of fewer calls than that is never hedged.
+    cancel() abandons every in-flight and later call, which then raises
+    CancelledError, until reset() is called. To abandon a single call, pass
+    it a token from cancel_token() and later call cancel(token).
+
+    Each attempt runs on its own daemon thread, so an abandoned straggler
+    never keeps the process from exiting.
+    """
+
+    def __init__(self, call_model, deadline=None, hedge=False, hedge_after=None, min_samples=20):
+        self.call_model = call_model
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+
+        self.attempts = LatencyWindow()
+        self.calls = LatencyWindow()
+        self.hedges = 0
+        self.timeouts = 0
+        self._cancelled = Future()
+        self._lock = threading.Lock()
+
+    def hedge_delay(self):
+        """Returns how long to wait before issuing a duplicate request, or None to not hedge."""
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if len(self.attempts) < self.min_samples:
+            return None
+        return self.attempts.percentile(95)
+
+    def _attempt(self, model, prompt):
+        start = time.monotonic()
+        result = self.call_model(model, prompt)
+        self.attempts.add(time.monotonic() - start)
+        return result
+
+    def _submit(self, model, prompt):
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self._attempt(model, prompt))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def cancel_token(self):
+        """Returns a token that abandons just the call it is passed to once given to cancel()."""
+        return Future()
+
+    def cancel(self, token=None):
+        """Abandons the call holding token, or all in-flight and future calls if no token is given."""
+        with self._lock:
+            target = self._cancelled if token is None else token
+            if not target.done():
+                target.set_result(None)
+
+    def reset(self):
+        """Accepts new calls again after cancel()."""
+        with self._lock:
+            if self._cancelled.done():
+                self._cancelled = Future()
+
+    def __call__(self, model, prompt, cancel_token=None):
+        with self._lock:
+            cancellers = {self._cancelled}
+        if cancel_token is not None:
+            cancellers.add(cancel_token)
+        if any(canceller.done() for canceller in cancellers):
+            raise CancelledError(f"{model} call was cancelled")
+
+        start = time.monotonic()
+        pending = {self._submit(model, prompt)}
+        hedge_at = self.hedge_delay()
+        last_error = None
+
+        while pending:
+            elapsed = time.monotonic() - start
+            if self.deadline is not None and elapsed >= self.deadline:
+                for future in pending:
+                    future.cancel()
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError(f"{model} call exceeded the {self.deadline}s deadline")
+            if hedge_at is not None and elapsed >= hedge_at:
+                pending.add(self._submit(model, prompt))
+                hedge_at = None
+                with self._lock:
+                    self.hedges += 1
+
+            waits = []
+            if self.deadline is not None:
+                waits.append(self.deadline - elapsed)
+            if hedge_at is not None:
+                waits.append(hedge_at - elapsed)
+            done, _ = wait(pending | cancellers, timeout=min(waits) if waits else None,
+                           return_when=FIRST_COMPLETED)
+
+            if any(canceller.done() for canceller in cancellers):
+                for future in pending:
+                    future.cancel()
+                raise CancelledError(f"{model} call was cancelled")
+
+            for future in done:
+                pending.discard(future)
+                if future.exception() is None:
+                    # The first success wins; any straggler still running is left to finish on its own
+                    for other in pending:
+                        other.cancel()
+                    self.calls.add(time.monotonic() - start)
+                    return future.result()
+                last_error = future.exception()
+
+        raise last_error
+
+    def latency_report(self):
+        """Returns p50/p95/p99 of completed calls together with hedge and timeout counts."""
+        report = self.calls.report()
+        with self._lock:
+            report.update(hedges=self.hedges, timeouts=self.timeouts)
+        return report
+
+    def print_latency_report(self):
+        report = self.latency_report()
+        print(f"Call latency over {report['count']} calls: p50 {report['p50']:.2f}s, p95 {report['p95']:.2f}s, "
+              f"p99 {report['p99']:.2f}s ({report['hedges']} hedged, {report['timeouts']} timed out)")
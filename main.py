@@ -1,11 +1,9 @@
 import ebooklib
 from ebooklib import epub
-import google.generativeai as genai
 import os
 import time
 import re
 import sys
-from dotenv import load_dotenv
 from utils import (
     sanitize_filename, 
     get_chapter_identifier, 
@@ -14,11 +12,18 @@ from utils import (
     summarize_text_with_gemini,
     create_chapter_summary_prompt,
     create_full_summary_prompt,
-    is_non_chapter_content
+    is_non_chapter_content,
+    format_final_summary,
+    estimate_tokens
 )
 from extract_images import create_image_map, extract_chapter_images_and_context
 
-load_dotenv()
+EXCLUDE_KEYWORDS = [
+    "cover", "titlepage", "dedication", "nav", "introduction",
+    "acknowledgments", "about_the_author", "ba1", "copyright",
+    "credits", "publisher", "preface", "foreword", "epilogue",
+    "appendix", "index", "glossary", "bibliography", "frontmatter"
+]
 
 def get_chapter_content(item):
     """Extracts text content from an EPUB item (chapter)."""
@@ -48,7 +53,50 @@ def filter_chapters(items, exclude_keywords):
 
 
 
-def main(epub_path, full_summary_only=False):
+def compress_chapter(chapter_content, compress_ratio=None, token_budget=None):
+    """
+    Extractively compresses a chapter's text before it is sent to the API.
+
+    The markup is stripped first and the ratio applies to the remaining text;
+    the tokens saved by stripping alone are reported as markup_tokens_saved.
+    Raises ValueError for a ratio outside (0, 1] or a non-positive budget.
+    """
+    from compress import compress_text, html_to_text
+    start = time.process_time()
+    text = html_to_text(chapter_content)
+    compressed, stats = compress_text(text, ratio=compress_ratio, token_budget=token_budget)
+    stats["markup_tokens_saved"] = estimate_tokens(chapter_content) - stats["original_tokens"]
+    stats["cpu_time"] = time.process_time() - start
+    print(f"Compressed chapter from {stats['original_tokens']} to {stats['compressed_tokens']} tokens "
+          f"(ratio {stats['compression_ratio']:.2f}, {stats['markup_tokens_saved']} markup tokens stripped, "
+          f"{stats['cpu_time']:.3f}s CPU)")
+    return compressed, stats
+
+def get_spine_positions(book):
+    """Maps the id of every item in the book's spine to its position in the reading order."""
+    positions = {}
+    for position, entry in enumerate(book.spine):
+        item_id = entry[0] if isinstance(entry, (tuple, list)) else getattr(entry, "id", entry)
+        positions[item_id] = position
+    return positions
+
+def write_chapter_summary(summary, item_name, image_context, output_base_dir, bundle=None, position=None):
+    """Appends the chapter's image links to its summary and saves it to its file or to a BookBundle."""
+    if image_context:
+        summary += "\n\n### Images\n\n"
+        for img_info in image_context:
+            # Ensure image_path is relative to the summary file
+            relative_image_path = os.path.relpath(img_info["image_path"], os.path.dirname(os.path.join(output_base_dir, get_chapter_identifier(item_name) + ".md")))
+            summary += f"![{img_info['context_text']}]({relative_image_path})\n"
+
+    if bundle:
+        bundle.add_chapter(item_name, summary, position)
+        print(f"Summary for {item_name} written to {bundle.path}")
+    else:
+        save_summary_to_file(summary, item_name, output_base_dir)
+
+def main(epub_path, full_summary_only=False, compress_ratio=None, token_budget=None, model_routing=False,
+         deadline=None, hedge=False, bundle=False, hedge_after=None):
     if not os.path.exists(epub_path):
         print(f"Error: EPUB file not found at {epub_path}")
         return
@@ -57,24 +105,60 @@ def main(epub_path, full_summary_only=False):
 
     book_folder_name = get_book_output_folder(book, default_name="summaries_output")
     output_base_dir = os.path.join(os.path.dirname(epub_path), book_folder_name)
-    os.makedirs(output_base_dir, exist_ok=True)
-    print(f"Summaries will be saved in: {output_base_dir}")
 
-    if not full_summary_only:
-        exclude_keywords = [
-            "cover", "titlepage", "dedication", "nav", "introduction",
-            "acknowledgments", "about_the_author", "ba1", "copyright",
-            "credits", "publisher", "preface", "foreword", "epilogue",
-            "appendix", "index", "glossary", "bibliography", "frontmatter"
-        ]   
+    router = hedged_caller = None
+    if model_routing or deadline is not None or hedge or hedge_after is not None:
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            print("Error: GEMINI_API_KEY environment variable not set.")
+            return
+        from routing import make_gemini_router
+        router, hedged_caller = make_gemini_router(gemini_api_key, model_routing, deadline, hedge, hedge_after)
 
+    book_bundle = None
+    if bundle:
+        from bundle import BookBundle, get_bundle_path, write_book_metadata
+        bundle_path = get_bundle_path(epub_path, book_folder_name)
+        if full_summary_only and not os.path.exists(bundle_path):
+            print(f"Error: bundle not found at {bundle_path}")
+            return
+        book_bundle = BookBundle(bundle_path)
+        write_book_metadata(book_bundle, book, book_folder_name, epub_path)
+        print(f"Summaries will be saved in: {book_bundle.path}")
+    else:
+        os.makedirs(output_base_dir, exist_ok=True)
+        print(f"Summaries will be saved in: {output_base_dir}")
+
+    try:
+        summarize_book(book, epub_path, book_folder_name, output_base_dir, full_summary_only, compress_ratio,
+                       token_budget, router, book_bundle)
+    finally:
+        if book_bundle:
+            book_bundle.close()
+
+    if router:
+        print("\nModel latency:")
+        router.print_latency_report()
+    if hedged_caller:
+        hedged_caller.print_latency_report()
+
+def summarize_book(book, epub_path, book_folder_name, output_base_dir, full_summary_only=False, compress_ratio=None,
+                   token_budget=None, router=None, bundle=None):
+    """Summarizes the chapters of an opened book and then the whole book."""
+    if not full_summary_only:
         image_map = create_image_map(book)
-        chapters_to_summarize = filter_chapters(book.get_items(), exclude_keywords)
+        chapters_to_summarize = filter_chapters(book.get_items(), EXCLUDE_KEYWORDS)
+        spine_positions = get_spine_positions(book)
         chapter_image_counts = {}
+        compress = compress_ratio is not None or token_budget is not None
+        total_original_tokens = 0
+        total_compressed_tokens = 0
+        total_markup_tokens_saved = 0
+        total_compression_cpu_time = 0.0
 
         print(f"Processing EPUB: {epub_path}")
 
-        for item in chapters_to_summarize:
+        for index, item in enumerate(chapters_to_summarize):
             chapter_content = get_chapter_content(item)
             if not chapter_content or len(chapter_content.strip()) < 100:
                 print(f"Skipping almost empty chapter: {item.get_name()}")
@@ -86,59 +170,92 @@ def main(epub_path, full_summary_only=False):
                 print("Error: GEMINI_API_KEY environment variable not set.")
                 return
 
-            image_context = extract_chapter_images_and_context(item, image_map, output_base_dir, chapter_image_counts)
+            image_context = extract_chapter_images_and_context(item, image_map, output_base_dir, chapter_image_counts, bundle)
             
-            summary = summarize_text_with_gemini(create_chapter_summary_prompt(chapter_content), gemini_api_key)
+            if compress:
+                chapter_content, stats = compress_chapter(chapter_content, compress_ratio, token_budget)
+                total_original_tokens += stats["original_tokens"]
+                total_compressed_tokens += stats["compressed_tokens"]
+                total_markup_tokens_saved += stats["markup_tokens_saved"]
+                total_compression_cpu_time += stats["cpu_time"]
+
+            prompt = create_chapter_summary_prompt(chapter_content)
+            if router:
+                summary = router.summarize(prompt, stage="chapter")
+            else:
+                summary = summarize_text_with_gemini(prompt, gemini_api_key)
             
             if summary:
-                # Append image links to the summary
-                if image_context:
-                    summary += "\n\n### Images\n\n"
-                    for img_info in image_context:
-                        # Ensure image_path is relative to the summary file
-                        relative_image_path = os.path.relpath(img_info["image_path"], os.path.dirname(os.path.join(output_base_dir, get_chapter_identifier(item.get_name()) + ".md")))
-                        summary += f"![{img_info['context_text']}]({relative_image_path})\n"
-
-                save_summary_to_file(summary, item.get_name(), output_base_dir)
+                position = spine_positions.get(item.get_id(), len(spine_positions) + index)
+                write_chapter_summary(summary, item.get_name(), image_context, output_base_dir, bundle, position)
             else:
                 print(f"Summarization failed for {item.get_name()}")
 
-    create_final_summary(book_folder_name, output_base_dir)
+        if compress and total_original_tokens:
+            print(f"Compression total: {total_original_tokens} -> {total_compressed_tokens} tokens "
+                  f"(ratio {total_compressed_tokens / total_original_tokens:.2f}, "
+                  f"{total_markup_tokens_saved} markup tokens stripped, {total_compression_cpu_time:.3f}s CPU)")
 
-def create_final_summary(book_folder_name, output_base_dir):
+    create_final_summary(book_folder_name, output_base_dir, summarize=router.summarizer("final") if router else None,
+                         bundle=bundle)
+
+def create_final_summary(book_folder_name, output_base_dir, summarize=None, bundle=None):
+    """
+    Synthesizes the chapter summaries in output_base_dir (or in a BookBundle) into a full book summary.
+
+    summarize is a callable taking a prompt and returning the summary text; it
+    defaults to the Gemini API using the GEMINI_API_KEY environment variable.
+    Returns the path of the saved summary, or None on failure.
+    """
     print("\nGenerating final summary...")
 
     chapter_summaries = []
-    for filename in os.listdir(output_base_dir):
-        if filename.endswith(".md"):
-            with open(os.path.join(output_base_dir, filename), "r", encoding="utf-8") as f:
-                chapter_summaries.append(f.read())
+    if bundle:
+        for identifier in bundle.chapter_identifiers():
+            chapter_summaries.append(bundle.get_chapter_markdown(identifier))
+    else:
+        for filename in os.listdir(output_base_dir):
+            if filename.endswith(".md"):
+                with open(os.path.join(output_base_dir, filename), "r", encoding="utf-8") as f:
+                    chapter_summaries.append(f.read())
 
     if not chapter_summaries:
         print("No chapter summaries found to generate a final summary.")
         return
 
     full_text = "\n\n".join(chapter_summaries)
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        print("Error: GEMINI_API_KEY environment variable not set.")
-        return
+    if summarize is None:
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            print("Error: GEMINI_API_KEY environment variable not set.")
+            return
+        summarize = lambda prompt: summarize_text_with_gemini(prompt, gemini_api_key)
 
-    final_summary = summarize_text_with_gemini(create_full_summary_prompt(full_text), gemini_api_key)
+    final_summary = summarize(create_full_summary_prompt(full_text))
 
-    if final_summary:
+    if final_summary and bundle:
+        bundle.set_full_summary(final_summary)
+        print(f"Final summary saved to {bundle.path}")
+        return bundle.path
+    elif final_summary:
         final_summary_filename = f"summary_{book_folder_name}_Full.md"
         final_summary_path = os.path.join(output_base_dir, final_summary_filename)
         with open(final_summary_path, "w", encoding="utf-8") as f:
-            f.write(f"# Final Summary: {book_folder_name}\n\n{final_summary}")
+            f.write(format_final_summary(final_summary, book_folder_name))
         print(f"Final summary saved to {final_summary_path}")
+        return final_summary_path
     else:
         print("Failed to generate final summary.")
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
     if len(sys.argv) < 2:
-        print("Usage: python main.py <path_to_epub_file> [--full-summary-only]")
+        print("Usage: python main.py <path_to_epub_file> [--full-summary-only] "
+              "[--compress-ratio <0-1>] [--token-budget <tokens>] [--model-routing] "
+              "[--deadline <seconds>] [--hedge] [--hedge-after <seconds>] [--bundle]")
         sys.exit(1)
     
     epub_file = sys.argv[1]
@@ -147,4 +264,34 @@ if __name__ == "__main__":
 
     full_summary_only = "--full-summary-only" in sys.argv
 
-    main(epub_file, full_summary_only)
+    compress_ratio = None
+    if "--compress-ratio" in sys.argv:
+        compress_ratio = float(sys.argv[sys.argv.index("--compress-ratio") + 1])
+
+    token_budget = None
+    if "--token-budget" in sys.argv:
+        token_budget = int(sys.argv[sys.argv.index("--token-budget") + 1])
+
+    if compress_ratio is not None or token_budget is not None:
+        from compress import validate_limits
+        try:
+            validate_limits(compress_ratio, token_budget)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    model_routing = "--model-routing" in sys.argv
+
+    deadline = None
+    if "--deadline" in sys.argv:
+        deadline = float(sys.argv[sys.argv.index("--deadline") + 1])
+
+    hedge = "--hedge" in sys.argv
+
+    hedge_after = None
+    if "--hedge-after" in sys.argv:
+        hedge_after = float(sys.argv[sys.argv.index("--hedge-after") + 1])
+
+    bundle = "--bundle" in sys.argv
+
+    main(epub_file, full_summary_only, compress_ratio, token_budget, model_routing, deadline, hedge, bundle, hedge_after)
@@ -0,0 +1,229 @@
+import bisect
+import threading
+import time
+from utils import estimate_tokens
+
+# Per stage, the first route whose token limit fits the prompt wins (None = no limit).
+DEFAULT_ROUTES = {
+    "chapter": [(4000, "gemini-2.5-flash-lite"), (None, "gemini-2.5-flash")],
+    "final": [(None, "gemini-2.5-flash")],
+}
+
+FIXED_ROUTES = {
+    "chapter": [(None, "gemini-2.5-flash")],
+    "final": [(None, "gemini-2.5-flash")],
+}
+
+DEFAULT_FALLBACKS = {
+    "gemini-2.5-flash": "gemini-2.5-flash-lite",
+    "gemini-2.5-flash-lite": "gemini-2.5-flash",
+}
+
+LATENCY_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def classify_error(error):
+    """Returns "throttled" for rate limits, "timeout" for timeouts and None for other errors."""
+    message = str(error)
+    name = type(error).__name__
+    if "429" in message or name == "ResourceExhausted":
+        return "throttled"
+    if isinstance(error, TimeoutError) or name == "DeadlineExceeded" or "504" in message or "timed out" in message.lower():
+        return "timeout"
+    return None
+
+
+class LatencyHistogram:
+    """Counts call latencies (in seconds) in fixed, roughly logarithmic buckets."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def to_dict(self):
+        labels = [f"<={bound}s" for bound in self.bounds] + [f">{self.bounds[-1]}s"]
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class ModelRouter:
+    """
+    Picks a model per request from its stage and input size, failing over on sustained errors.
+
+    call_model(model_name, prompt) must return the response text and raise on
+    failure. After failover_after consecutive rate limits or timeouts a model
+    is skipped for cooldown seconds in favour of its fallback, which is always
+    tried at least once even if the failover used up the last retry.
+    Successful call latencies are recorded per model so the routing
+    thresholds can be tuned. The last route of every stage must have no token
+    limit (None), so every prompt has a route; ValueError is raised otherwise.
+    """
+
+    def __init__(self, call_model, routes=None, fallbacks=None, failover_after=2, cooldown=60.0,
+                 max_retries=5, initial_delay=1, clock=time.monotonic, sleep=time.sleep):
+        self.call_model = call_model
+        self.routes = routes or DEFAULT_ROUTES
+        for stage, stage_routes in self.routes.items():
+            if not stage_routes or stage_routes[-1][0] is not None:
+                raise ValueError(f"The last {stage!r} route must have no token limit (None).")
+        self.fallbacks = DEFAULT_FALLBACKS if fallbacks is None else fallbacks
+        self.failover_after = failover_after
+        self.cooldown = cooldown
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.clock = clock
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._consecutive_failures = {}
+        self._cooling_until = {}
+        self._histograms = {}
+        self._counters = {}
+
+    def _is_cooling(self, model):
+        return self._cooling_until.get(model, 0) > self.clock()
+
+    def select(self, stage, tokens):
+        """Returns the model to use for a prompt of the given stage and token count."""
+        # The last route has no limit (checked in __init__), so a route always matches
+        model = next(model for max_tokens, model in self.routes[stage]
+                     if max_tokens is None or tokens <= max_tokens)
+        with self._lock:
+            fallback = self.fallbacks.get(model)
+            if self._is_cooling(model) and fallback and not self._is_cooling(fallback):
+                return fallback
+        return model
+
+    def _count(self, model, key, amount=1):
+        counters = self._counters.setdefault(model, {"calls": 0, "tokens": 0, "throttled": 0, "timeout": 0})
+        counters[key] += amount
+
+    def _record_success(self, model, tokens, seconds):
+        with self._lock:
+            self._consecutive_failures[model] = 0
+            self._histograms.setdefault(model, LatencyHistogram()).observe(seconds)
+            self._count(model, "calls")
+            self._count(model, "tokens", tokens)
+
+    def _record_failure(self, model, kind):
+        """Records a throttle or timeout; returns True if it made the model fail over."""
+        with self._lock:
+            self._count(model, kind)
+            failures = self._consecutive_failures.get(model, 0) + 1
+            self._consecutive_failures[model] = failures
+            if failures >= self.failover_after and model in self.fallbacks:
+                self._cooling_until[model] = self.clock() + self.cooldown
+                self._consecutive_failures[model] = 0
+                return True
+        return False
+
+    def summarize(self, prompt, stage="chapter"):
+        """Summarizes a prompt with the routed model, retrying with exponential backoff."""
+        tokens = estimate_tokens(prompt)
+        delay = self.initial_delay
+
+        attempts = 0
+        tried = set()
+        while attempts < self.max_retries:
+            attempts += 1
+            model = self.select(stage, tokens)
+            tried.add(model)
+            start = self.clock()
+            try:
+                text = self.call_model(model, prompt)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None:
+                    print(f"Error summarizing text with {model}: {e}")
+                    return None
+                if self._record_failure(model, kind):
+                    fallback = self.fallbacks[model]
+                    print(f"{model} {kind} repeatedly. Failing over to {fallback}.")
+                    if fallback not in tried:
+                        # Give the fallback at least one attempt, even after the last retry
+                        attempts = min(attempts, self.max_retries - 1)
+                    continue
+                print(f"{model} {kind}. Retrying in {delay} seconds...")
+                self.sleep(delay)
+                delay *= 2
+                continue
+            self._record_success(model, tokens, self.clock() - start)
+            return text
+
+        print("Failed to summarize text after multiple retries.")
+        return None
+
+    def summarizer(self, stage):
+        """Returns a prompt -> summary callable bound to a stage."""
+        return lambda prompt: self.summarize(prompt, stage)
+
+    def latency_stats(self):
+        """Returns the latency histogram and call counters of every model used so far."""
+        with self._lock:
+            return {
+                model: dict(counters, latency=self._histograms.get(model, LatencyHistogram()).to_dict())
+                for model, counters in self._counters.items()
+            }
+
+    def print_latency_report(self):
+        for model, stats in sorted(self.latency_stats().items()):
+            latency = stats["latency"]
+            buckets = ", ".join(f"{label}: {count}" for label, count in latency["buckets"].items() if count)
+            print(f"{model}: {stats['calls']} calls, {stats['tokens']} tokens, mean {latency['mean']:.2f}s, "
+                  f"{stats['throttled']} throttled, {stats['timeout']} timeouts [{buckets}]")
+
+
+def make_gemini_caller(api_key, timeout=None):
+    """
+    Returns a call_model function that keeps one configured Gemini client per model.
+
+    timeout (in seconds) is passed to the API so a request abandoned after its
+    deadline does not keep running in the background.
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    models = {}
+    lock = threading.Lock()
+
+    def call_model(model_name, prompt):
+        with lock:
+            if model_name not in models:
+                models[model_name] = genai.GenerativeModel(model_name)
+            model = models[model_name]
+        if timeout is not None:
+            return model.generate_content(prompt, request_options={"timeout": timeout}).text
+        return model.generate_content(prompt).text
+
+    return call_model
+
+
+def make_gemini_router(api_key, model_routing=False, deadline=None, hedge=False, hedge_after=None):
+    """
+    Builds the router used by main and the service for the Gemini API.
+
+    Without model_routing every request goes to gemini-2.5-flash. A deadline
+    or hedging wraps the API calls in a HedgedCaller, which is returned
+    alongside the router (or None) so its latency percentiles can be reported.
+    hedge_after (in seconds) enables hedging at a fixed delay instead of the
+    observed p95, which is only used once enough calls have been made.
+    """
+    call_model = make_gemini_caller(api_key, timeout=deadline)
+    hedged_caller = None
+    hedge = hedge or hedge_after is not None
+    if deadline is not None or hedge:
+        from hedging import HedgedCaller
+        call_model = hedged_caller = HedgedCaller(call_model, deadline=deadline, hedge=hedge, hedge_after=hedge_after)
+
+    if model_routing:
+        return ModelRouter(call_model), hedged_caller
+    return ModelRouter(call_model, routes=FIXED_ROUTES, fallbacks={}), hedged_caller
@@ -0,0 +1,485 @@
+import collections
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ebooklib import epub
+from utils import get_book_output_folder, create_chapter_summary_prompt, sanitize_filename
+from main import (
+    EXCLUDE_KEYWORDS,
+    filter_chapters,
+    get_chapter_content,
+    get_spine_positions,
+    compress_chapter,
+    write_chapter_summary,
+    create_final_summary
+)
+from extract_images import create_image_map, extract_chapter_images_and_context
+
+
+def get_job_output_name(epub_path, book_folder_name):
+    """Names the output of a book whose title is already in use after both its title and its EPUB file."""
+    file_name = sanitize_filename(os.path.basename(epub_path))
+    if file_name == book_folder_name:
+        return book_folder_name
+    return f"{book_folder_name}_{file_name}"
+
+
+class FairScheduler:
+    """A queue of chapter tasks that hands them out round-robin across books."""
+
+    def __init__(self):
+        self._queues = collections.OrderedDict()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def add(self, book_id, tasks):
+        with self._condition:
+            self._queues.setdefault(book_id, collections.deque()).extend(tasks)
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        """Returns the next task, or None once the scheduler is closed or the timeout expires."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queues or self._closed, timeout):
+                return None
+            if not self._queues:
+                return None
+            book_id, tasks = next(iter(self._queues.items()))
+            task = tasks.popleft()
+            # Move the book to the back of the rotation so every book gets a turn
+            if tasks:
+                self._queues.move_to_end(book_id)
+            else:
+                del self._queues[book_id]
+            return task
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return sum(len(tasks) for tasks in self._queues.values())
+
+
+class BookJob:
+    """Tracks the progress of one submitted EPUB."""
+
+    def __init__(self, job_id, epub_path):
+        self.job_id = job_id
+        self.epub_path = epub_path
+        self.status = "queued"
+        self.output_dir = None
+        self.bundle = None
+        self.holds_slot = False
+        self.holds_output = False
+        self.chapters_total = 0
+        self.chapters_done = 0
+        self.final_summary_path = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "epub_path": self.epub_path,
+            "status": self.status,
+            "output_dir": self.output_dir,
+            "bundle_path": self.bundle.path if self.bundle else None,
+            "chapters_total": self.chapters_total,
+            "chapters_done": self.chapters_done,
+            "final_summary_path": self.final_summary_path,
+            "error": self.error,
+        }
+
+
+class SummaryService:
+    """
+    Long-running summarizer that processes queued EPUBs with warm workers.
+
+    summarize is a callable taking a prompt and returning the summary text (or
+    None on failure); it is shared by all workers, so a configured API client
+    is reused across chapters and books. final_summarize, if given, is used
+    for the full book summary instead. With bundle set, each book is written
+    to a single BookBundle file instead of a folder. Parser threads turn submitted books
+    into chapter tasks, and summarizer workers take chapters from all queued
+    books in turn. At most max_active_books are parsed but not yet finished
+    at any time; further books wait in the parse queue.
+
+    Each book's output is named after its title, as main.py names it. Only
+    while another book with the same title in the same folder is active is
+    the EPUB file name appended (see get_job_output_name), so concurrent books
+    never write into the same folder or bundle. Finished jobs are forgotten
+    once more than max_finished_jobs have accumulated.
+    """
+
+    def __init__(self, summarize, workers=4, parsers=1, compress_ratio=None, token_budget=None, final_summarize=None,
+                 bundle=False, max_active_books=8, max_finished_jobs=1000):
+        self.summarize = summarize
+        self.final_summarize = final_summarize or summarize
+        self.workers = workers
+        self.parsers = parsers
+        self.compress_ratio = compress_ratio
+        self.token_budget = token_budget
+        self.bundle = bundle
+
+        self.jobs = {}
+        self.max_finished_jobs = max_finished_jobs
+        self._finished_jobs = collections.deque()
+        self.scheduler = FairScheduler()
+        self._parse_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._seen_inbox_files = set()
+        self._inbox_observations = {}
+        self._active_books = threading.BoundedSemaphore(max_active_books)
+        self._active_outputs = {}
+        self._in_flight = 0
+        self._chapters_completed = 0
+        self._books_completed = 0
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.time()
+        for _ in range(self.parsers):
+            self._spawn(self._parser_loop)
+        for _ in range(self.workers):
+            self._spawn(self._worker_loop)
+
+    def stop(self, cancel_in_flight=None):
+        """
+        Stops the service once the running chapters are done.
+
+        cancel_in_flight, if given, is called after workers can no longer
+        take new chapters, to abandon the API calls that are still running.
+        """
+        self._stop.set()
+        self.scheduler.close()
+        if cancel_in_flight:
+            cancel_in_flight()
+        for _ in range(self.parsers):
+            self._parse_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def submit(self, epub_path):
+        """Queues an EPUB for summarization and returns its job id."""
+        job = BookJob(uuid.uuid4().hex[:12], os.path.abspath(epub_path))
+        with self._lock:
+            self.jobs[job.job_id] = job
+        self._parse_queue.put(job)
+        print(f"Queued {job.epub_path} as job {job.job_id}")
+        return job.job_id
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def wait(self, job_id, timeout=None):
+        """
+        Blocks until a job has finished; returns False if the timeout expired first.
+
+        An unknown (or already forgotten) job id returns None straight away.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return job.done.wait(timeout)
+
+    def stats(self):
+        """Returns queue depth, in-flight chapters and throughput since start."""
+        with self._lock:
+            uptime = time.time() - self._started_at if self._started_at else 0.0
+            return {
+                "books_waiting_to_parse": self._parse_queue.qsize(),
+                "books_active": len(self._active_outputs),
+                "queue_depth": len(self.scheduler),
+                "in_flight": self._in_flight,
+                "chapters_completed": self._chapters_completed,
+                "books_completed": self._books_completed,
+                "throughput_chapters_per_sec": self._chapters_completed / uptime if uptime else 0.0,
+                "uptime": uptime,
+            }
+
+    def scan_inbox(self, inbox_dir):
+        """
+        Submits any new EPUB in inbox_dir and returns the new job ids.
+
+        A file is only submitted once its size and modification time are
+        unchanged since the previous scan, so files still being copied in are
+        not picked up half-written.
+        """
+        job_ids = []
+        for path in sorted(glob.glob(os.path.join(inbox_dir, "*.epub"))):
+            if path in self._seen_inbox_files:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            observation = (stat.st_size, stat.st_mtime)
+            if self._inbox_observations.get(path) != observation:
+                self._inbox_observations[path] = observation
+                continue
+            del self._inbox_observations[path]
+            self._seen_inbox_files.add(path)
+            job_ids.append(self.submit(path))
+        return job_ids
+
+    def watch_inbox(self, inbox_dir, poll_interval=2.0):
+        """Polls inbox_dir for new EPUB files in a background thread."""
+        def watch():
+            while not self._stop.is_set():
+                self.scan_inbox(inbox_dir)
+                self._stop.wait(poll_interval)
+        self._spawn(watch)
+
+    def _parser_loop(self):
+        while True:
+            job = self._parse_queue.get()
+            if job is None:
+                return
+            # Wait for an active book to finish before reading another one into memory
+            while not self._active_books.acquire(timeout=0.5):
+                if self._stop.is_set():
+                    return
+            job.holds_slot = True
+            try:
+                self._parse_book(job)
+            except Exception as e:
+                print(f"Error parsing {job.epub_path}: {e}")
+                self._finish(job, "failed", error=str(e))
+
+    def _parse_book(self, job):
+        job.status = "parsing"
+        if not os.path.exists(job.epub_path):
+            self._finish(job, "failed", error=f"EPUB file not found at {job.epub_path}")
+            return
+
+        book = epub.read_epub(job.epub_path)
+        book_folder_name = get_book_output_folder(book, default_name="summaries_output")
+        output_name = self._claim_output(job, book_folder_name)
+        if output_name is None:
+            self._finish(job, "failed", error=f"{job.epub_path} is already being summarized")
+            return
+
+        if self.bundle:
+            from bundle import BookBundle, get_bundle_path, write_book_metadata
+            job.bundle = BookBundle(get_bundle_path(job.epub_path, output_name))
+            write_book_metadata(job.bundle, book, book_folder_name, job.epub_path)
+        else:
+            os.makedirs(job.output_dir, exist_ok=True)
+
+        image_map = create_image_map(book)
+        chapter_image_counts = {}
+        spine_positions = get_spine_positions(book)
+        tasks = []
+        for index, item in enumerate(filter_chapters(book.get_items(), EXCLUDE_KEYWORDS)):
+            chapter_content = get_chapter_content(item)
+            if not chapter_content or len(chapter_content.strip()) < 100:
+                print(f"Skipping almost empty chapter: {item.get_name()}")
+                continue
+
+            image_context = extract_chapter_images_and_context(item, image_map, job.output_dir, chapter_image_counts,
+                                                               job.bundle)
+            if self.compress_ratio is not None or self.token_budget is not None:
+                chapter_content, _ = compress_chapter(chapter_content, self.compress_ratio, self.token_budget)
+            position = spine_positions.get(item.get_id(), len(spine_positions) + index)
+            tasks.append((job, book_folder_name, item.get_name(), create_chapter_summary_prompt(chapter_content),
+                          image_context, position))
+
+        job.chapters_total = len(tasks)
+        job.status = "summarizing"
+        if tasks:
+            self.scheduler.add(job.job_id, tasks)
+        else:
+            self._finalize(job, book_folder_name)
+
+    def _claim_output(self, job, book_folder_name):
+        """Reserves an output name for the job and returns it, or None if its EPUB is already active."""
+        epub_dir = os.path.dirname(job.epub_path)
+        with self._lock:
+            for output_name in (book_folder_name, get_job_output_name(job.epub_path, book_folder_name)):
+                output_dir = os.path.join(epub_dir, output_name)
+                owner = self._active_outputs.get(output_dir)
+                if owner == job.epub_path:
+                    return None
+                if owner is None:
+                    self._active_outputs[output_dir] = job.epub_path
+                    job.output_dir = output_dir
+                    job.holds_output = True
+                    return output_name
+        return None
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            task = self.scheduler.get(timeout=0.5)
+            if task is None:
+                continue
+            job, book_folder_name, item_name, prompt, image_context, position = task
+            with self._lock:
+                self._in_flight += 1
+            try:
+                summary = self.summarize(prompt)
+                if summary:
+                    write_chapter_summary(summary, item_name, image_context, job.output_dir, job.bundle, position)
+                else:
+                    print(f"Summarization failed for {item_name}")
+            except Exception as e:
+                print(f"Error summarizing {item_name}: {e}")
+            with self._lock:
+                self._in_flight -= 1
+                self._chapters_completed += 1
+                job.chapters_done += 1
+                book_finished = job.chapters_done == job.chapters_total
+            # No final summaries are started while shutting down
+            if book_finished and not self._stop.is_set():
+                self._finalize(job, book_folder_name)
+
+    def _finalize(self, job, book_folder_name):
+        job.status = "finalizing"
+        try:
+            job.final_summary_path = create_final_summary(book_folder_name, job.output_dir, summarize=self.final_summarize,
+                                                           bundle=job.bundle)
+        except Exception as e:
+            self._finish(job, "failed", error=str(e))
+            return
+        if job.final_summary_path:
+            self._finish(job, "done")
+        else:
+            self._finish(job, "failed", error="Failed to generate final summary.")
+
+    def _finish(self, job, status, error=None):
+        if job.bundle:
+            job.bundle.close()
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        with self._lock:
+            self._books_completed += 1
+            if job.holds_output:
+                del self._active_outputs[job.output_dir]
+                job.holds_output = False
+            self._finished_jobs.append(job.job_id)
+            while len(self._finished_jobs) > self.max_finished_jobs:
+                self.jobs.pop(self._finished_jobs.popleft(), None)
+        if job.holds_slot:
+            job.holds_slot = False
+            self._active_books.release()
+        job.done.set()
+
+
+def create_http_server(service, host="127.0.0.1", port=8765):
+    """
+    Creates a small JSON API for the service.
+
+    POST /jobs {"epub_path": ...} queues a book, GET /jobs and GET /jobs/<id>
+    report job progress and GET /stats reports the service metrics.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, service.stats())
+            elif self.path == "/jobs":
+                self._send_json(200, [job.to_dict() for job in list(service.jobs.values())])
+            elif self.path.startswith("/jobs/"):
+                job = service.get_job(self.path[len("/jobs/"):])
+                if job:
+                    self._send_json(200, job)
+                else:
+                    self._send_json(404, {"error": "Unknown job"})
+            else:
+                self._send_json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self._send_json(404, {"error": "Not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                if length < 0:
+                    raise ValueError("Content-Length must not be negative")
+                epub_path = json.loads(self.rfile.read(length))["epub_path"]
+                if not isinstance(epub_path, str):
+                    raise TypeError("epub_path must be a string")
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {"error": "Expected a JSON body with an epub_path"})
+                return
+            self._send_json(202, {"job_id": service.submit(epub_path)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def serve(inbox_dir=None, host="127.0.0.1", port=8765, workers=4, compress_ratio=None, token_budget=None,
+          model_routing=False, deadline=None, hedge=False, bundle=False, hedge_after=None):
+    """Runs the service against the Gemini API until interrupted."""
+    gemini_api_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_api_key:
+        print("Error: GEMINI_API_KEY environment variable not set.")
+        return
+
+    router = hedged_caller = None
+    if model_routing or deadline is not None or hedge or hedge_after is not None:
+        from routing import make_gemini_router
+        router, hedged_caller = make_gemini_router(gemini_api_key, model_routing, deadline, hedge, hedge_after)
+        summarize, final_summarize = router.summarizer("chapter"), router.summarizer("final")
+    else:
+        from utils import make_gemini_summarizer
+        summarize = final_summarize = make_gemini_summarizer(gemini_api_key)
+
+    service = SummaryService(summarize, workers=workers, compress_ratio=compress_ratio,
+                             token_budget=token_budget, final_summarize=final_summarize, bundle=bundle)
+    service.start()
+    if inbox_dir:
+        os.makedirs(inbox_dir, exist_ok=True)
+        service.watch_inbox(inbox_dir)
+        print(f"Watching inbox: {inbox_dir}")
+
+    server = None
+    if port is not None:
+        server = create_http_server(service, host, port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Listening on http://{host}:{server.server_address[1]}")
+
+    try:
+        while True:
+            time.sleep(30)
+            print(f"Service stats: {service.stats()}")
+            if router:
+                router.print_latency_report()
+            if hedged_caller:
+                hedged_caller.print_latency_report()
+    except KeyboardInterrupt:
+        print("Shutting down...")
+    finally:
+        if server:
+            server.shutdown()
+        # Unblock workers waiting on slow API calls so they can exit
+        service.stop(cancel_in_flight=hedged_caller.cancel if hedged_caller else None)
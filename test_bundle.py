@@ -0,0 +1,156 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import shutil
+import tempfile
+from bundle import BookBundle, export_bundle, get_bundle_path
+from main import main, write_chapter_summary, create_final_summary
+from extract_images import extract_chapter_images_and_context
+
+class TestBookBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "Test_Book.sqlite")
+        self.bundle = BookBundle(self.path)
+
+    def tearDown(self):
+        self.bundle.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_bundle_path(self):
+        self.assertEqual(get_bundle_path("/books/book.epub", "My_Book"), os.path.join("/books", "My_Book.sqlite"))
+
+    def test_chapters_in_order_with_random_access(self):
+        self.bundle.add_chapter("text/chapter2.xhtml", "Second summary")
+        self.bundle.add_chapter("text/chapter1.xhtml", "First summary")
+        self.bundle.add_image("chapter_1_image_1.jpg", b"fake_image_data", "chapter_1", "A test image")
+
+        self.assertEqual(self.bundle.chapter_identifiers(), ["chapter_2", "chapter_1"])
+        self.assertEqual(self.bundle.get_chapter("chapter_1"), {
+            "identifier": "chapter_1",
+            "item_name": "text/chapter1.xhtml",
+            "summary": "First summary",
+            "images": ["chapter_1_image_1.jpg"],
+        })
+        self.assertEqual(self.bundle.get_chapter_markdown("chapter_2"), "# Chapter: text/chapter2.xhtml\n\nSecond summary\n")
+        self.assertEqual(self.bundle.get_image("chapter_1_image_1.jpg"), b"fake_image_data")
+        self.assertIsNone(self.bundle.get_chapter("chapter_9"))
+        self.assertIsNone(self.bundle.get_image("missing.jpg"))
+
+    def test_rewriting_a_chapter_replaces_it(self):
+        self.bundle.add_chapter("chapter1.xhtml", "Old summary")
+        self.bundle.add_chapter("chapter2.xhtml", "Other summary")
+        self.bundle.add_chapter("chapter1.xhtml", "New summary")
+
+        self.assertEqual(self.bundle.chapter_identifiers(), ["chapter_1", "chapter_2"])
+        self.assertEqual(self.bundle.get_chapter("chapter_1")["summary"], "New summary")
+
+    def test_chapters_follow_reading_order_not_completion_order(self):
+        self.bundle.add_chapter("chapter3.xhtml", "Third summary", position=2)
+        self.bundle.add_chapter("chapter1.xhtml", "First summary", position=0)
+        self.bundle.add_chapter("chapter2.xhtml", "Second summary", position=1)
+
+        self.assertEqual(self.bundle.chapter_identifiers(), ["chapter_1", "chapter_2", "chapter_3"])
+
+    def test_contents_persist_after_reopening(self):
+        self.bundle.set_metadata("title", "Test Book: A Subtitle")
+        self.bundle.set_full_summary("The whole book.")
+        self.bundle.add_chapter("chapter1.xhtml", "First summary")
+        self.bundle.close()
+
+        self.bundle = BookBundle(self.path)
+        self.assertEqual(self.bundle.get_metadata()["title"], "Test Book: A Subtitle")
+        self.assertEqual(self.bundle.get_full_summary(), "The whole book.")
+        self.assertEqual(self.bundle.chapter_identifiers(), ["chapter_1"])
+
+    def test_export_to_folder_layout(self):
+        self.bundle.set_metadata("book_folder_name", "Test_Book")
+        self.bundle.add_chapter("chapter1.xhtml", "First summary")
+        self.bundle.add_image("chapter_1_image_1.jpg", b"fake_image_data", "chapter_1")
+        self.bundle.set_full_summary("The whole book.")
+        self.bundle.close()
+
+        output_dir = export_bundle(self.path)
+        self.bundle = BookBundle(self.path)
+
+        self.assertEqual(output_dir, os.path.join(self.tmpdir, "Test_Book"))
+        self.assertEqual(sorted(os.listdir(output_dir)), ["chapter_1.md", "chapter_1_image_1.jpg", "summary_Test_Book_Full.md"])
+        with open(os.path.join(output_dir, "chapter_1.md"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "# Chapter: chapter1.xhtml\n\nFirst summary\n")
+        with open(os.path.join(output_dir, "summary_Test_Book_Full.md"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "# Final Summary: Test_Book\n\nThe whole book.")
+
+    def test_export_rejects_paths_outside_the_folder(self):
+        for filename in ("../escaped.jpg", "sub/image.jpg", "..", ""):
+            with self.subTest(filename=filename):
+                self.bundle.add_image(filename, b"fake_image_data", "chapter_1")
+                with self.assertRaises(ValueError):
+                    self.bundle.export_to_folder(os.path.join(self.tmpdir, "out"))
+                self.bundle._execute("DELETE FROM images")
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "escaped.jpg")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "out")))
+
+        self.bundle.add_image("../escaped.jpg", b"fake_image_data", "chapter_1")
+        self.bundle.close()
+        self.assertIsNone(export_bundle(self.path))
+        self.bundle = BookBundle(self.path)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "escaped.jpg")))
+
+    def test_export_missing_bundle(self):
+        self.assertIsNone(export_bundle(os.path.join(self.tmpdir, "missing.sqlite")))
+
+class TestPipelineWritesToBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.tmpdir, "Test_Book")
+        self.bundle = BookBundle(os.path.join(self.tmpdir, "Test_Book.sqlite"))
+
+    def tearDown(self):
+        self.bundle.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_images_summaries_and_final_summary(self):
+        # Arrange
+        mock_chapter_item = MagicMock()
+        mock_chapter_item.get_name.return_value = "chapter1.xhtml"
+        mock_chapter_item.get_content.return_value = b'<html><body><img src="../images/test_image.jpg" alt="A test image"/></body></html>'
+        image_map = {"images/test_image.jpg": b"fake_image_data"}
+
+        # Act
+        image_context = extract_chapter_images_and_context(mock_chapter_item, image_map, self.output_dir, {}, self.bundle)
+        write_chapter_summary("First summary", "chapter1.xhtml", image_context, self.output_dir, self.bundle)
+        final_summary_path = create_final_summary("Test_Book", self.output_dir, summarize=lambda prompt: "The whole book.",
+                                                  bundle=self.bundle)
+
+        # Assert
+        self.assertFalse(os.path.exists(self.output_dir))
+        self.assertEqual(final_summary_path, self.bundle.path)
+        self.assertEqual(self.bundle.get_image("chapter_1_image_1.jpg"), b"fake_image_data")
+        self.assertIn("![A test image](chapter_1_image_1.jpg)", self.bundle.get_chapter("chapter_1")["summary"])
+        self.assertEqual(self.bundle.get_full_summary(), "The whole book.")
+
+class TestMainWithBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.epub_path = os.path.join(self.tmpdir, "book.epub")
+        open(self.epub_path, "wb").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @patch('main.epub.read_epub')
+    def test_full_summary_without_bundle_does_not_create_one(self, mock_read_epub):
+        mock_book = MagicMock()
+        mock_book.get_metadata.return_value = [('Test Book', {})]
+        mock_read_epub.return_value = mock_book
+
+        main(self.epub_path, full_summary_only=True, bundle=True)
+
+        self.assertEqual(os.listdir(self.tmpdir), ["book.epub"])
+
+if __name__ == '__main__':
+    unittest.main()
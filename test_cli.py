@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch
+import os
+import subprocess
+import sys
+import cli
+from bench_startup import compare_to_baseline, parse_importtime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def loaded_modules(code):
+    """Runs code in a fresh interpreter and returns the names of the modules it ended up importing."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"{code}; import sys; print('\\n'.join(sys.modules))"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    return set(result.stdout.split())
+
+class TestParser(unittest.TestCase):
+
+    def test_summarize_arguments(self):
+        args = cli.build_parser().parse_args(["summarize", "my\\ book.epub", "--token-budget", "500"])
+        self.assertEqual(args.command, "summarize")
+        self.assertEqual(args.epub_path, "my book.epub")
+        self.assertEqual(args.token_budget, 500)
+        self.assertIsNone(args.compress_ratio)
+
+    def test_invalid_compression_limits_are_rejected(self):
+        for argv in (["--compress-ratio", "0"], ["--compress-ratio", "-1"], ["--compress-ratio", "1.5"],
+                     ["--token-budget", "0"]):
+            with self.subTest(argv=argv), patch('sys.stderr'), self.assertRaises(SystemExit):
+                cli.build_parser().parse_args(["summarize", "book.epub"] + argv)
+
+    def test_subcommand_is_required(self):
+        with self.assertRaises(SystemExit):
+            cli.build_parser().parse_args([])
+
+class TestDispatch(unittest.TestCase):
+
+    @patch('main.main')
+    def test_run_summarize(self, mock_main):
+        cli.run(["summarize", "book.epub", "--compress-ratio", "0.5"])
+        mock_main.assert_called_once_with("book.epub", False, 0.5, None, False, None, False, False, None)
+
+    @patch('main.main')
+    def test_run_full_summary(self, mock_main):
+        cli.run(["full-summary", "book.epub"])
+        mock_main.assert_called_once_with("book.epub", full_summary_only=True, model_routing=False,
+                                          deadline=None, hedge=False, bundle=False, hedge_after=None)
+
+    @patch('extract_images.extract_images')
+    def test_run_extract_images(self, mock_extract_images):
+        cli.run(["extract-images", "book.epub"])
+        mock_extract_images.assert_called_once_with("book.epub")
+
+    @patch('bundle.export_bundle')
+    def test_run_export_bundle(self, mock_export_bundle):
+        cli.run(["export-bundle", "book.sqlite", "--output-dir", "out"])
+        mock_export_bundle.assert_called_once_with("book.sqlite", "out")
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_cli_import_is_light(self):
+        modules = loaded_modules("import cli")
+        self.assertNotIn("ebooklib", modules)
+        self.assertNotIn("google.generativeai", modules)
+        self.assertNotIn("bs4", modules)
+        self.assertNotIn("dotenv", modules)
+
+    def test_extract_images_skips_gemini(self):
+        modules = loaded_modules("import cli; cli.load_command('extract-images')")
+        self.assertIn("ebooklib", modules)
+        self.assertNotIn("google.generativeai", modules)
+
+    def test_full_summary_skips_parsers(self):
+        modules = loaded_modules("import cli; cli.load_command('full-summary')")
+        self.assertNotIn("bs4", modules)
+        self.assertNotIn("numpy", modules)
+
+    def test_export_bundle_skips_parsers_and_gemini(self):
+        modules = loaded_modules("import cli; cli.load_command('export-bundle')")
+        self.assertNotIn("ebooklib", modules)
+        self.assertNotIn("lxml", modules)
+        self.assertNotIn("google.generativeai", modules)
+        self.assertNotIn("bs4", modules)
+
+class TestStartupBenchmark(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      2000 |       2500 | cli\n"
+        )
+        self.assertEqual(parse_importtime(stderr), {"_io": (120, 120), "cli": (2000, 2500)})
+
+    def test_compare_to_baseline(self):
+        baseline = {"summarize": {"wall_time": 1.0}, "serve": {"wall_time": 1.0}}
+        results = {"summarize": {"wall_time": 1.1}, "serve": {"wall_time": 1.5}, "export-bundle": {"wall_time": 0.1}}
+        self.assertEqual(compare_to_baseline(results, baseline, tolerance=0.2), ["serve"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import numpy as np
+import compress
+
+CHAPTER_TEXT = (
+    "Negotiation is a skill that anyone can learn. "
+    "Good negotiation starts with knowing what the other side wants. "
+    "The weather was pleasant on the day of the meeting. "
+    "Skilled negotiators listen more than they talk during a negotiation. "
+    "Lunch was served at noon.\n"
+    "Preparation is the foundation of every successful negotiation. "
+    "The room had blue curtains."
+)
+
+class TestSplitSentences(unittest.TestCase):
+
+    def test_split_sentences(self):
+        sentences = compress.split_sentences("First one. Second one!\nThird one? Fourth")
+        self.assertEqual(sentences, ["First one.", "Second one!", "Third one?", "Fourth"])
+
+    def test_html_to_text(self):
+        text = compress.html_to_text("<html><body><h1>Title</h1><p>Para one.</p><p>Para two.</p></body></html>")
+        self.assertEqual(text, "Title\nPara one.\nPara two.")
+
+    def test_html_to_text_skips_head(self):
+        text = compress.html_to_text("<html><head><title>x</title></head><body><p>Para one.</p></body></html>")
+        self.assertEqual(text, "Para one.")
+
+class TestTextRank(unittest.TestCase):
+
+    def test_tfidf_rows_are_normalised(self):
+        matrix = compress.tfidf_matrix(compress.split_sentences(CHAPTER_TEXT))
+        np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0)
+
+    def test_central_sentences_rank_highest(self):
+        sentences = compress.split_sentences(CHAPTER_TEXT)
+        scores = compress.textrank_scores(sentences)
+        self.assertAlmostEqual(scores.sum(), 1.0)
+        best = sentences[int(np.argmax(scores))]
+        self.assertIn("negotiat", best.lower())
+
+class TestCompressText(unittest.TestCase):
+
+    def test_compress_to_ratio(self):
+        compressed, stats = compress.compress_text(CHAPTER_TEXT, ratio=0.5)
+        self.assertLessEqual(stats["compressed_tokens"], stats["original_tokens"] * 0.5 + 1)
+        self.assertLess(stats["compression_ratio"], 1.0)
+        self.assertGreaterEqual(stats["cpu_time"], 0.0)
+        self.assertNotIn("curtains", compressed)
+        # Kept sentences stay in their original order
+        kept = compressed.splitlines()
+        original = compress.split_sentences(CHAPTER_TEXT)
+        self.assertEqual(kept, [s for s in original if s in kept])
+
+    def test_compress_to_token_budget(self):
+        compressed, stats = compress.compress_text(CHAPTER_TEXT, token_budget=30)
+        self.assertLessEqual(stats["compressed_tokens"], 30)
+        self.assertTrue(compressed)
+
+    def test_over_budget_sentence_does_not_block_lower_ranked_ones(self):
+        order = np.array([0, 1, 2, 3])
+        lengths = np.array([5, 50, 5, 5])
+
+        selected = compress.select_within_budget(order, lengths, limit=12)
+
+        np.testing.assert_array_equal(selected, [0, 2])
+
+    def test_best_sentence_is_kept_when_nothing_fits(self):
+        selected = compress.select_within_budget(np.array([2, 0, 1]), np.array([30, 30, 30]), limit=10)
+        np.testing.assert_array_equal(selected, [2])
+
+    def test_text_within_budget_is_unchanged(self):
+        compressed, stats = compress.compress_text(CHAPTER_TEXT, token_budget=10000)
+        self.assertEqual(compressed, CHAPTER_TEXT)
+        self.assertEqual(stats["compression_ratio"], 1.0)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            compress.compress_text(CHAPTER_TEXT)
+        with self.assertRaises(ValueError):
+            compress.compress_text(CHAPTER_TEXT, ratio=1.5)
+        with self.assertRaises(ValueError):
+            compress.compress_text(CHAPTER_TEXT, token_budget=0)
+
+if __name__ == '__main__':
+    unittest.main()
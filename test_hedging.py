@@ -0,0 +1,184 @@
+import unittest
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+from hedging import HedgedCaller, LatencyWindow, percentile
+from routing import ModelRouter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+class StragglerBackend:
+    """Fake call_model that answers quickly except for every Nth request, which straggles."""
+
+    def __init__(self, fast=0.002, slow=0.2, every=25):
+        self.fast = fast
+        self.slow = slow
+        self.every = every
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, model, prompt):
+        with self._lock:
+            self.requests += 1
+            straggle = self.requests % self.every == 0
+        time.sleep(self.slow if straggle else self.fast)
+        return f"summary of {prompt}"
+
+def measure(caller, count):
+    latencies = []
+    for i in range(count):
+        start = time.monotonic()
+        caller("model", f"prompt {i}")
+        latencies.append(time.monotonic() - start)
+    return latencies
+
+class TestPercentile(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 95), 95)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([], 99), 0.0)
+
+    def test_latency_window_report(self):
+        window = LatencyWindow(size=3)
+        for seconds in (10, 1, 2, 3):
+            window.add(seconds)
+        self.assertEqual(window.report(), {"count": 3, "p50": 2, "p95": 3, "p99": 3})
+
+class TestHedgedCaller(unittest.TestCase):
+
+    def test_hedging_shrinks_the_tail(self):
+        # Warm up both callers so the hedged one has observed a p95 to hedge at
+        plain = HedgedCaller(StragglerBackend())
+        hedged = HedgedCaller(StragglerBackend(), hedge=True, min_samples=20)
+        measure(plain, 25)
+        measure(hedged, 25)
+
+        plain_latencies = measure(plain, 50)
+        hedged_latencies = measure(hedged, 50)
+
+        self.assertGreaterEqual(percentile(plain_latencies, 99), 0.2)
+        self.assertLess(percentile(hedged_latencies, 99), 0.1)
+        self.assertGreaterEqual(hedged.latency_report()["hedges"], 2)
+        self.assertEqual(plain.latency_report()["hedges"], 0)
+
+    def test_no_hedging_before_enough_samples(self):
+        caller = HedgedCaller(StragglerBackend(), hedge=True, min_samples=20)
+        self.assertIsNone(caller.hedge_delay())
+        self.assertEqual(HedgedCaller(StragglerBackend(), hedge=True, hedge_after=0.5).hedge_delay(), 0.5)
+
+    def test_deadline_raises_timeout(self):
+        caller = HedgedCaller(StragglerBackend(fast=1.0), deadline=0.05)
+
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            caller("model", "prompt")
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(caller.latency_report()["timeouts"], 1)
+
+    def test_cancel_abandons_in_flight_calls(self):
+        caller = HedgedCaller(StragglerBackend(fast=1.0))
+        errors = []
+
+        def call():
+            try:
+                caller("model", "prompt")
+            except CancelledError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.05)
+        caller.cancel()
+        thread.join(timeout=0.5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+
+    def test_no_request_is_sent_after_cancel(self):
+        backend = StragglerBackend()
+        caller = HedgedCaller(backend)
+        caller.cancel()
+
+        with self.assertRaises(CancelledError):
+            caller("model", "prompt")
+        self.assertEqual(backend.requests, 0)
+
+        caller.reset()
+        self.assertEqual(caller("model", "prompt"), "summary of prompt")
+
+    def test_cancel_token_abandons_only_its_call(self):
+        backend = StragglerBackend(fast=1.0)
+        caller = HedgedCaller(backend)
+        token = caller.cancel_token()
+        errors = []
+
+        def call():
+            try:
+                caller("model", "prompt", cancel_token=token)
+            except CancelledError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.05)
+        caller.cancel(token)
+        thread.join(timeout=0.5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+        # Other calls are unaffected
+        backend.fast = 0.002
+        self.assertEqual(caller("model", "other"), "summary of other")
+
+    def test_process_exits_promptly_after_cancel(self):
+        code = (
+            "import threading, time\n"
+            "from hedging import HedgedCaller\n"
+            "caller = HedgedCaller(lambda model, prompt: time.sleep(10))\n"
+            "threading.Thread(target=lambda: caller('model', 'prompt'), daemon=True).start()\n"
+            "time.sleep(0.1)\n"
+            "caller.cancel()\n"
+        )
+        start = time.monotonic()
+        subprocess.run([sys.executable, "-c", code], cwd=HERE, check=True, timeout=10)
+        self.assertLess(time.monotonic() - start, 3)
+
+    def test_process_exits_promptly_after_a_hedge_wins(self):
+        code = (
+            "import time\n"
+            "from hedging import HedgedCaller\n"
+            "calls = []\n"
+            "def backend(model, prompt):\n"
+            "    calls.append(prompt)\n"
+            "    time.sleep(10 if len(calls) == 1 else 0.01)\n"
+            "    return 'summary'\n"
+            "assert HedgedCaller(backend, hedge=True, hedge_after=0.05)('model', 'prompt') == 'summary'\n"
+        )
+        start = time.monotonic()
+        subprocess.run([sys.executable, "-c", code], cwd=HERE, check=True, timeout=10)
+        self.assertLess(time.monotonic() - start, 3)
+
+    def test_errors_are_raised_to_the_caller(self):
+        def failing(model, prompt):
+            raise ValueError("400 Invalid argument")
+
+        with self.assertRaises(ValueError):
+            HedgedCaller(failing, deadline=1.0)("model", "prompt")
+
+    def test_router_retries_calls_past_their_deadline(self):
+        backend = StragglerBackend(fast=0.001, slow=1.0, every=1)
+        router = ModelRouter(HedgedCaller(backend, deadline=0.05), routes={"chapter": [(None, "model")]},
+                             fallbacks={}, sleep=lambda seconds: setattr(backend, "every", 1000))
+
+        self.assertEqual(router.summarize("prompt"), "summary of prompt")
+        self.assertEqual(router.latency_stats()["model"]["timeout"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 from unittest.mock import patch, MagicMock, call
 import os
 import sys
-from main import main, filter_chapters
+from main import main, filter_chapters, compress_chapter
 from utils import save_summary_to_file, summarize_text_with_gemini
 import ebooklib
 from ebooklib import epub
@@ -72,5 +72,39 @@ class TestChapterFiltering(unittest.TestCase):
         self.assertEqual(len(chapters), 1)
         self.assertEqual(chapters[0].get_name(), "chapter1.xhtml")
 
+class TestChapterCompression(unittest.TestCase):
+
+    def test_compress_chapter(self):
+        # Arrange
+        content = "<html><body>" + "".join(
+            f"<p>Sentence number {i} talks about topic {i % 3}.</p>" for i in range(20)
+        ) + "</body></html>"
+
+        # Act
+        compressed, stats = compress_chapter(content, compress_ratio=0.25)
+
+        # Assert
+        self.assertNotIn("<p>", compressed)
+        self.assertLess(stats["original_tokens"], (len(content) + 3) // 4)
+        self.assertLessEqual(stats["compressed_tokens"], stats["original_tokens"] * 0.25)
+
+    def test_ratio_applies_to_text_not_markup(self):
+        content = "<html><body>" + "".join(
+            f'<p class="para">Sentence number {i} talks about topic {i % 3}.</p>' for i in range(60)
+        ) + "</body></html>"
+
+        compressed, stats = compress_chapter(content, compress_ratio=0.9)
+
+        # Stripping the markup is reported separately and does not count towards the ratio
+        self.assertGreater(stats["markup_tokens_saved"], 0)
+        self.assertLess(len(compressed.splitlines()), 60)
+        self.assertLessEqual(stats["compressed_tokens"], stats["original_tokens"] * 0.9)
+
+    def test_invalid_ratio_is_rejected(self):
+        content = "<html><body><p>Sentence one.</p><p>Sentence two.</p></body></html>"
+        for ratio in (0, -1, 1.5):
+            with self.assertRaises(ValueError):
+                compress_chapter(content, compress_ratio=ratio)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
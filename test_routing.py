@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import MagicMock
+from routing import ModelRouter, LatencyHistogram, classify_error
+
+ROUTES = {
+    "chapter": [(100, "small"), (None, "large")],
+    "final": [(None, "large")],
+}
+FALLBACKS = {"small": "large", "large": "small"}
+
+class FakeClock:
+    """Manually advanced stand-in for time.monotonic."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeModels:
+    """Fake call_model that replays scripted results per model and advances the clock by a latency."""
+
+    def __init__(self, clock, scripts, latency=1.0):
+        self.clock = clock
+        self.scripts = scripts
+        self.latency = latency
+        self.calls = []
+
+    def __call__(self, model, prompt):
+        self.calls.append(model)
+        self.clock.now += self.latency
+        result = self.scripts[model].pop(0) if self.scripts.get(model) else f"summary from {model}"
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+class TestClassifyError(unittest.TestCase):
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error(Exception("429 Resource has been exhausted")), "throttled")
+        self.assertEqual(classify_error(TimeoutError()), "timeout")
+        self.assertEqual(classify_error(Exception("504 Deadline Exceeded")), "timeout")
+        self.assertIsNone(classify_error(ValueError("400 Invalid argument")))
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_observe(self):
+        histogram = LatencyHistogram(bounds=(1, 2))
+        for seconds in (0.5, 1, 1.5, 10):
+            histogram.observe(seconds)
+
+        stats = histogram.to_dict()
+        self.assertEqual(stats["buckets"], {"<=1s": 2, "<=2s": 1, ">2s": 1})
+        self.assertEqual(stats["count"], 4)
+        self.assertAlmostEqual(stats["mean"], 3.25)
+
+class TestModelRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sleep = MagicMock()
+
+    def make_router(self, scripts, **kwargs):
+        self.models = FakeModels(self.clock, scripts)
+        return ModelRouter(self.models, routes=ROUTES, fallbacks=FALLBACKS, clock=self.clock,
+                           sleep=self.sleep, **kwargs)
+
+    def test_routes_by_size_and_stage(self):
+        router = self.make_router({})
+
+        self.assertEqual(router.summarize("x" * 40, stage="chapter"), "summary from small")
+        self.assertEqual(router.summarize("x" * 4000, stage="chapter"), "summary from large")
+        self.assertEqual(router.summarize("x" * 40, stage="final"), "summary from large")
+
+    def test_single_throttle_retries_same_model(self):
+        router = self.make_router({"small": [Exception("429 Rate limit exceeded")]}, failover_after=2)
+
+        self.assertEqual(router.summarize("short prompt"), "summary from small")
+        self.assertEqual(self.models.calls, ["small", "small"])
+        self.sleep.assert_called_once_with(1)
+
+    def test_sustained_throttling_fails_over(self):
+        throttled = [Exception("429 Rate limit exceeded")] * 2
+        router = self.make_router({"small": list(throttled)}, failover_after=2, cooldown=30)
+
+        self.assertEqual(router.summarize("short prompt"), "summary from large")
+        self.assertEqual(self.models.calls, ["small", "small", "large"])
+        # Later requests keep using the fallback until the cooldown expires
+        self.assertEqual(router.select("chapter", 10), "large")
+        self.clock.now += 30
+        self.assertEqual(router.select("chapter", 10), "small")
+
+    def test_timeouts_fail_over(self):
+        router = self.make_router({"large": [TimeoutError(), TimeoutError()]}, failover_after=2)
+
+        self.assertEqual(router.summarize("x" * 40, stage="final"), "summary from small")
+
+    def test_other_errors_are_not_retried(self):
+        router = self.make_router({"small": [ValueError("400 Invalid argument")]})
+
+        self.assertIsNone(router.summarize("short prompt"))
+        self.assertEqual(self.models.calls, ["small"])
+
+    def test_gives_up_after_max_retries(self):
+        router = self.make_router({"small": [Exception("429")] * 3}, failover_after=10, max_retries=3)
+
+        self.assertIsNone(router.summarize("short prompt"))
+        self.assertEqual(self.sleep.call_count, 3)
+
+    def test_failover_on_last_retry_still_tries_fallback(self):
+        throttled = [Exception("429 Rate limit exceeded")] * 2
+        router = self.make_router({"small": list(throttled)}, failover_after=2, max_retries=2)
+
+        self.assertEqual(router.summarize("short prompt"), "summary from large")
+        self.assertEqual(self.models.calls, ["small", "small", "large"])
+
+    def test_failing_over_back_and_forth_is_bounded(self):
+        router = self.make_router({"small": [Exception("429")] * 10, "large": [Exception("429")] * 10},
+                                  failover_after=1, max_retries=2)
+
+        self.assertIsNone(router.summarize("short prompt"))
+        self.assertEqual(self.models.calls, ["small", "large"])
+
+    def test_routes_must_end_without_a_limit(self):
+        with self.assertRaises(ValueError):
+            ModelRouter(MagicMock(), routes={"chapter": [(100, "small")]})
+
+    def test_latency_stats(self):
+        router = self.make_router({"small": [Exception("429")]}, failover_after=5)
+        router.summarize("short prompt")
+        router.summarize("x" * 4000)
+
+        stats = router.latency_stats()
+        self.assertEqual(stats["small"]["calls"], 1)
+        self.assertEqual(stats["small"]["throttled"], 1)
+        self.assertEqual(stats["small"]["latency"]["count"], 1)
+        self.assertEqual(stats["large"]["tokens"], 1000)
+        self.assertAlmostEqual(stats["large"]["latency"]["mean"], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,317 @@
+import unittest
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from ebooklib import epub
+from service import FairScheduler, SummaryService, create_http_server
+from bundle import BookBundle, export_bundle
+
+def make_epub(path, title, chapter_count):
+    """Writes a small EPUB with chapter_count chapters long enough to be summarized."""
+    book = epub.EpubBook()
+    book.set_identifier(title)
+    book.set_title(title)
+    book.set_language("en")
+    chapters = []
+    for i in range(1, chapter_count + 1):
+        chapter = epub.EpubHtml(title=f"Chapter {i}", file_name=f"chapter{i}.xhtml", lang="en")
+        chapter.content = f"<h1>Chapter {i}</h1><p>{title} chapter {i} text. " + "More content here. " * 20 + "</p>"
+        book.add_item(chapter)
+        chapters.append(chapter)
+    book.toc = chapters
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    book.spine = chapters
+    epub.write_epub(path, book)
+
+class FakeBackend:
+    """Thread-safe stand-in for the Gemini API that records every prompt it receives."""
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            return f"Fake summary {len(self.prompts)}"
+
+class TestFairScheduler(unittest.TestCase):
+
+    def test_round_robin_across_books(self):
+        scheduler = FairScheduler()
+        scheduler.add("a", ["a1", "a2", "a3"])
+        scheduler.add("b", ["b1"])
+        scheduler.add("c", ["c1", "c2"])
+
+        order = [scheduler.get(timeout=0) for _ in range(6)]
+
+        self.assertEqual(order, ["a1", "b1", "c1", "a2", "c2", "a3"])
+        self.assertEqual(len(scheduler), 0)
+
+    def test_get_returns_none_when_closed(self):
+        scheduler = FairScheduler()
+        scheduler.close()
+        self.assertIsNone(scheduler.get())
+
+class TestSummaryService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.backend = FakeBackend()
+        self.service = SummaryService(self.backend, workers=2)
+        self.service.start()
+
+    def tearDown(self):
+        self.service.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_books_are_summarized_end_to_end(self):
+        make_epub(os.path.join(self.tmpdir, "one.epub"), "Book One", 3)
+        make_epub(os.path.join(self.tmpdir, "two.epub"), "Book Two", 2)
+
+        job_ids = [self.service.submit(os.path.join(self.tmpdir, name)) for name in ("one.epub", "two.epub")]
+        for job_id in job_ids:
+            self.assertTrue(self.service.wait(job_id, timeout=10))
+
+        job = self.service.get_job(job_ids[0])
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["chapters_done"], 3)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, "Book_One", "chapter_1.md")))
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, "Book_Two", "summary_Book_Two_Full.md")))
+        # Five chapter prompts plus one final summary prompt per book
+        self.assertEqual(len(self.backend.prompts), 7)
+
+        stats = self.service.stats()
+        self.assertEqual(stats["chapters_completed"], 5)
+        self.assertEqual(stats["books_completed"], 2)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertGreater(stats["throughput_chapters_per_sec"], 0)
+
+    def test_bundle_output_exports_to_folder_layout(self):
+        make_epub(os.path.join(self.tmpdir, "one.epub"), "Book One", 3)
+        folder_service = SummaryService(FakeBackend(), workers=1)
+        bundle_service = SummaryService(FakeBackend(), workers=1, bundle=True)
+        for service in (folder_service, bundle_service):
+            service.start()
+            job_id = service.submit(os.path.join(self.tmpdir, "one.epub"))
+            self.assertTrue(service.wait(job_id, timeout=10))
+            self.assertEqual(service.get_job(job_id)["status"], "done")
+            service.stop()
+            if service is folder_service:
+                os.rename(os.path.join(self.tmpdir, "Book_One"), os.path.join(self.tmpdir, "folder_output"))
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "Book_One")))
+        exported = export_bundle(os.path.join(self.tmpdir, "Book_One.sqlite"), os.path.join(self.tmpdir, "exported"))
+        expected = os.path.join(self.tmpdir, "folder_output")
+        self.assertEqual(sorted(os.listdir(exported)), sorted(os.listdir(expected)))
+        for filename in os.listdir(expected):
+            with open(os.path.join(expected, filename), encoding="utf-8") as f1, open(os.path.join(exported, filename), encoding="utf-8") as f2:
+                self.assertEqual(f1.read(), f2.read())
+
+    def test_bundle_keeps_reading_order_and_title(self):
+        make_epub(os.path.join(self.tmpdir, "one.epub"), "Book One", 3)
+
+        def summarize(prompt):
+            # The first chapter finishes last
+            if "Book One chapter 1 text" in prompt:
+                time.sleep(0.3)
+            return "Fake summary"
+
+        service = SummaryService(summarize, workers=3, bundle=True)
+        service.start()
+        try:
+            job_id = service.submit(os.path.join(self.tmpdir, "one.epub"))
+            self.assertTrue(service.wait(job_id, timeout=10))
+        finally:
+            service.stop()
+
+        with BookBundle(os.path.join(self.tmpdir, "Book_One.sqlite")) as bundle:
+            self.assertEqual(bundle.chapter_identifiers(), ["chapter_1", "chapter_2", "chapter_3"])
+            self.assertEqual(bundle.get_metadata()["title"], "Book One")
+
+    def test_stop_cancels_in_flight_calls_without_starting_queued_ones(self):
+        make_epub(os.path.join(self.tmpdir, "one.epub"), "Book One", 3)
+        started = threading.Event()
+        release = threading.Event()
+        prompts = []
+
+        def blocking_backend(prompt):
+            prompts.append(prompt)
+            started.set()
+            release.wait()
+            return None
+
+        service = SummaryService(blocking_backend, workers=1)
+        service.start()
+        job_id = service.submit(os.path.join(self.tmpdir, "one.epub"))
+        self.assertTrue(started.wait(timeout=10))
+
+        service.stop(cancel_in_flight=release.set)
+
+        # Only the chapter already in flight was sent; queued chapters and the final summary were not
+        self.assertEqual(len(prompts), 1)
+        self.assertEqual(service.stats()["queue_depth"], 2)
+        self.assertNotEqual(service.get_job(job_id)["status"], "failed")
+
+    def test_missing_book_fails(self):
+        job_id = self.service.submit(os.path.join(self.tmpdir, "missing.epub"))
+        self.assertTrue(self.service.wait(job_id, timeout=10))
+        self.assertEqual(self.service.get_job(job_id)["status"], "failed")
+
+    def test_scan_inbox_submits_new_books_once(self):
+        inbox = os.path.join(self.tmpdir, "inbox")
+        os.makedirs(inbox)
+        make_epub(os.path.join(inbox, "one.epub"), "Inbox Book", 1)
+
+        # The first scan only records the file; it is submitted once it is unchanged
+        self.assertEqual(self.service.scan_inbox(inbox), [])
+        job_ids = self.service.scan_inbox(inbox)
+        self.assertEqual(len(job_ids), 1)
+        self.assertEqual(self.service.scan_inbox(inbox), [])
+        self.assertTrue(self.service.wait(job_ids[0], timeout=10))
+
+    def test_scan_inbox_waits_for_files_being_copied(self):
+        inbox = os.path.join(self.tmpdir, "inbox")
+        os.makedirs(inbox)
+        path = os.path.join(inbox, "partial.epub")
+        with open(path, "wb") as f:
+            f.write(b"PK")
+
+        self.assertEqual(self.service.scan_inbox(inbox), [])
+        with open(path, "ab") as f:
+            f.write(b"more bytes")
+        self.assertEqual(self.service.scan_inbox(inbox), [])
+        self.assertEqual(len(self.service.jobs), 0)
+
+    def test_books_with_the_same_title_do_not_share_output(self):
+        make_epub(os.path.join(self.tmpdir, "first.epub"), "Same Title", 3)
+        make_epub(os.path.join(self.tmpdir, "second.epub"), "Same Title", 1)
+        release = threading.Event()
+        backend = FakeBackend()
+
+        def summarize(prompt):
+            # Keep the first book active until both books have been parsed
+            release.wait(10)
+            return backend(prompt)
+
+        service = SummaryService(summarize, workers=2)
+        service.start()
+        try:
+            job_ids = [service.submit(os.path.join(self.tmpdir, name)) for name in ("first.epub", "second.epub")]
+            deadline = time.time() + 5
+            while service.get_job(job_ids[1])["status"] in ("queued", "parsing") and time.time() < deadline:
+                time.sleep(0.01)
+            release.set()
+            for job_id in job_ids:
+                self.assertTrue(service.wait(job_id, timeout=10))
+        finally:
+            service.stop()
+
+        first, second = (service.get_job(job_id) for job_id in job_ids)
+        self.assertEqual((first["status"], second["status"]), ("done", "done"))
+        # The first book gets the same folder main.py would use; only the overlapping one is renamed
+        self.assertEqual(first["output_dir"], os.path.join(self.tmpdir, "Same_Title"))
+        self.assertEqual(second["output_dir"], os.path.join(self.tmpdir, "Same_Title_second"))
+        self.assertEqual(sorted(os.listdir(second["output_dir"])), ["chapter_1.md", "summary_Same_Title_Full.md"])
+        # Each final summary prompt only contains its own book's chapter summaries
+        final_prompts = [prompt for prompt in backend.prompts if "# Chapter:" in prompt]
+        self.assertEqual(sorted(prompt.count("# Chapter:") for prompt in final_prompts), [1, 3])
+
+    def test_finished_jobs_are_forgotten(self):
+        service = SummaryService(FakeBackend(), workers=1, max_finished_jobs=1)
+        service.start()
+        try:
+            job_ids = [service.submit(os.path.join(self.tmpdir, name)) for name in ("missing1.epub", "missing2.epub")]
+            self.assertTrue(service.wait(job_ids[1], timeout=5))
+        finally:
+            service.stop()
+
+        self.assertEqual(list(service.jobs), [job_ids[1]])
+        self.assertIsNone(service.get_job(job_ids[0]))
+        self.assertIsNone(service.wait(job_ids[0]))
+        self.assertIsNone(service.wait("unknown"))
+
+    def test_active_books_are_limited(self):
+        service = SummaryService(FakeBackend(), workers=0, max_active_books=1)
+        service.start()
+        try:
+            for name in ("one.epub", "two.epub"):
+                make_epub(os.path.join(self.tmpdir, name), name, 1)
+                service.submit(os.path.join(self.tmpdir, name))
+            deadline = time.time() + 5
+            while service.stats()["books_active"] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.1)
+
+            stats = service.stats()
+            self.assertEqual(stats["books_active"], 1)
+            self.assertEqual(stats["queue_depth"], 1)
+        finally:
+            service.stop()
+
+    def test_http_api(self):
+        make_epub(os.path.join(self.tmpdir, "one.epub"), "Http Book", 1)
+        server = create_http_server(self.service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            request = urllib.request.Request(
+                f"{base_url}/jobs",
+                data=json.dumps({"epub_path": os.path.join(self.tmpdir, "one.epub")}).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.status, 202)
+                job_id = json.loads(response.read())["job_id"]
+
+            self.assertTrue(self.service.wait(job_id, timeout=10))
+            with urllib.request.urlopen(f"{base_url}/jobs/{job_id}") as response:
+                self.assertEqual(json.loads(response.read())["status"], "done")
+            with urllib.request.urlopen(f"{base_url}/stats") as response:
+                self.assertEqual(json.loads(response.read())["chapters_completed"], 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_http_api_rejects_negative_content_length(self):
+        server = create_http_server(self.service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+            connection.putrequest("POST", "/jobs")
+            connection.putheader("Content-Length", "-1")
+            connection.endheaders()
+            response = connection.getresponse()
+            self.assertEqual(response.status, 400)
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_http_api_rejects_malformed_bodies(self):
+        server = create_http_server(self.service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for body in (b'{"epub_path": 5}', b'{"epub_path": null}', b'{}', b'not json'):
+                request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}/jobs", data=body,
+                                                 method="POST")
+                with self.assertRaises(urllib.error.HTTPError) as context:
+                    urllib.request.urlopen(request)
+                self.assertEqual(context.exception.code, 400)
+                context.exception.close()
+            self.assertEqual(self.service.jobs, {})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -94,7 +94,7 @@ class TestBookOutputFolder(unittest.TestCase):
 class TestSummarizationWithBackoff(unittest.TestCase):
 
     @patch('utils.time.sleep')
-    @patch('utils.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     def test_summarize_text_with_gemini_with_backoff(self, mock_generative_model, mock_sleep):
         # Arrange
         mock_model_instance = mock_generative_model.return_value
@@ -138,7 +138,7 @@ class TestSaveSummary(unittest.TestCase):
 
 class TestSummarization(unittest.TestCase):
 
-    @patch('utils.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     def test_summarize_text_with_gemini(self, MockGenerativeModel):
         # Arrange
         mock_model_instance = MockGenerativeModel.return_value
@@ -153,7 +153,7 @@ class TestSummarization(unittest.TestCase):
         self.assertEqual(summary, "This is a summary.")
         MockGenerativeModel.assert_called_with('gemini-2.5-flash')
 
-    @patch('utils.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     def test_summarize_text_with_gemini_with_image_context(self, MockGenerativeModel):
         # Arrange
         mock_model_instance = MockGenerativeModel.return_value
@@ -166,4 +166,19 @@ class TestSummarization(unittest.TestCase):
 
         # Assert
         self.assertEqual(summary, "This is a summary with images.")
-        mock_model_instance.generate_content.assert_called_once_with(prompt)
\ No newline at end of file
+        mock_model_instance.generate_content.assert_called_once_with(prompt)
+
+    @patch('google.generativeai.configure')
+    @patch('google.generativeai.GenerativeModel')
+    def test_make_gemini_summarizer_reuses_model(self, MockGenerativeModel, mock_configure):
+        # Arrange
+        MockGenerativeModel.return_value.generate_content.return_value.text = "This is a summary."
+
+        # Act
+        summarize = utils.make_gemini_summarizer("fake_key")
+        summaries = [summarize("first prompt"), summarize("second prompt")]
+
+        # Assert
+        self.assertEqual(summaries, ["This is a summary.", "This is a summary."])
+        mock_configure.assert_called_once_with(api_key="fake_key")
+        MockGenerativeModel.assert_called_once_with('gemini-2.5-flash')
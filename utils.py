@@ -1,8 +1,6 @@
 import re
 import os
 import time
-from ebooklib import epub
-import google.generativeai as genai
 
 def sanitize_filename(name):
     # Separate base and extension first from the original name
@@ -16,7 +14,7 @@ def sanitize_filename(name):
     
     return s if s else "unknown_section"
 
-def get_book_output_folder(book: epub.EpubBook, default_name: str = "processed_book") -> str:
+def get_book_output_folder(book: "ebooklib.epub.EpubBook", default_name: str = "processed_book") -> str:
     book_title_metadata = book.get_metadata('DC', 'title')
     if not book_title_metadata:
         return default_name # Use default if no title metadata is found
@@ -105,6 +103,10 @@ def is_non_chapter_content(content: str) -> bool:
             
     return False
 
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the token count of a text (about four characters per token)."""
+    return (len(text) + 3) // 4
+
 def get_chapter_title_from_content(content):
     """Extracts the chapter title from the chapter's content."""
     from bs4 import BeautifulSoup
@@ -123,6 +125,14 @@ def get_chapter_title_from_content(content):
     
     return "Untitled Chapter"
 
+def format_chapter_summary(summary, item_name):
+    """Formats a chapter summary as the contents of its Markdown file."""
+    return f"# Chapter: {item_name}\n\n{summary}\n"
+
+def format_final_summary(final_summary, book_folder_name):
+    """Formats the full book summary as the contents of its Markdown file."""
+    return f"# Final Summary: {book_folder_name}\n\n{final_summary}"
+
 def save_summary_to_file(summary, item_name, output_dir):
     """Saves the summary to a Markdown file."""
     chapter_identifier = get_chapter_identifier(item_name)
@@ -130,15 +140,21 @@ def save_summary_to_file(summary, item_name, output_dir):
     chapter_output_path = os.path.join(output_dir, filename)
     os.makedirs(os.path.dirname(chapter_output_path), exist_ok=True)
     with open(chapter_output_path, "w", encoding="utf-8") as f:
-        f.write(f"# Chapter: {item_name}\n\n{summary}\n")
+        f.write(format_chapter_summary(summary, item_name))
     print(f"Summary for {item_name} written to {chapter_output_path}")
 
 import time
 
-def summarize_text_with_gemini(prompt, api_key):
-    """Summarizes text using the Gemini API with exponential backoff."""
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash')
+def summarize_text_with_gemini(prompt, api_key, model=None):
+    """
+    Summarizes text using the Gemini API with exponential backoff.
+
+    An already configured model can be passed in to reuse a warm client.
+    """
+    if model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel('gemini-2.5-flash')
 
     initial_delay = 1
     max_retries = 5
@@ -160,6 +176,13 @@ def summarize_text_with_gemini(prompt, api_key):
     print("Failed to summarize text after multiple retries.")
     return None
 
+def make_gemini_summarizer(api_key, model_name='gemini-2.5-flash'):
+    """Configures a Gemini client once and returns a prompt -> summary callable that reuses it."""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(model_name)
+    return lambda prompt: summarize_text_with_gemini(prompt, api_key, model=model)
+
 def create_chapter_summary_prompt (text: str) -> str:
     return f"""## Role & Goal
     You are a Knowledge Distiller. Your mission is to distill the provided chapter summaries for a book into a concise, high-level overview. Your output should be a compact knowledge outline, not a detailed study guide.